@@ -0,0 +1,179 @@
+import io
+import csv
+from collections import Counter
+from datetime import datetime, timedelta
+
+from attendance_summary import adjust_daily_summary, insert_attendance_or_ignore
+from models import db, Attendance, Student
+from queries import chunked
+
+BULK_ACTIONS = ('mark_present', 'mark_absent')
+
+# Most rows one request may change
+BULK_MAX_ROWS = 20000
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(str(value).strip(), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('date must be YYYY-MM-DD')
+
+def parse_csv_marks(text, default_action='mark_present'):
+    """
+    Rows of a CSV with a header of student_id, date and optionally action.
+
+    Returns:
+        List of {'student_id', 'date', 'action'} dicts (values unvalidated)
+
+    Raises:
+        ValueError: if the header lacks student_id or date
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    fields = {name.strip().lower() for name in reader.fieldnames or []}
+    if not {'student_id', 'date'} <= fields:
+        raise ValueError('CSV needs student_id and date columns')
+
+    marks = []
+    for row in reader:
+        row = {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+        marks.append({
+            'student_id': row.get('student_id'),
+            'date': row.get('date'),
+            'action': row.get('action') or default_action
+        })
+    return marks
+
+def expand_class_marks(action, class_name, date_from, date_to=None, student_ids=None):
+    """
+    One mark per student of ``class_name`` (or per listed student) for
+    every day from ``date_from`` to ``date_to`` inclusive.
+
+    Raises:
+        ValueError: if the range is reversed or would exceed BULK_MAX_ROWS
+    """
+    date_to = date_to or date_from
+    if date_to < date_from:
+        raise ValueError('date_to is before date_from')
+
+    query = db.session.query(Student.id)
+    if class_name:
+        query = query.filter(Student.class_name == class_name)
+    if student_ids:
+        query = query.filter(Student.id.in_(student_ids))
+    ids = [student_id for student_id, in query.order_by(Student.id)]
+
+    days = (date_to - date_from).days + 1
+    if len(ids) * days > BULK_MAX_ROWS:
+        raise ValueError(f'{len(ids) * days} marks requested, at most {BULK_MAX_ROWS} allowed')
+
+    return [{'student_id': student_id, 'date': date_from + timedelta(days=offset), 'action': action}
+            for offset in range(days) for student_id in ids]
+
+def apply_marks(marks):
+    """
+    Applies many present/absent marks in the caller's transaction.
+
+    Marks are validated, then the students and their existing records are
+    read with a few IN queries, and the changes are written as one bulk
+    INSERT and one bulk DELETE per chunk, followed by one summary update
+    per (class, day). The INSERT skips records marked concurrently since
+    they were read, and only the rows it inserted count towards the
+    summary. Marks apply in order, so a later mark for the same student
+    and day overrides an earlier one. The caller commits.
+
+    Args:
+        marks: Iterable of {'student_id', 'date', 'action'} dicts; date may
+            be a date or a YYYY-MM-DD string
+
+    Returns:
+        (results, counts): one {'row', 'student_id', 'date', 'action',
+        'result'[, 'message']} per mark, ``result`` being 'marked',
+        'removed', 'unchanged' or 'error', and the number of each result
+
+    Raises:
+        ValueError: if there are more than BULK_MAX_ROWS marks
+    """
+    marks = list(marks)
+    if len(marks) > BULK_MAX_ROWS:
+        raise ValueError(f'{len(marks)} marks sent, at most {BULK_MAX_ROWS} allowed')
+
+    results = []
+    valid = []
+    for row, mark in enumerate(marks, start=1):
+        day = mark.get('date')
+        result = {'row': row, 'student_id': mark.get('student_id'),
+                  'date': day.isoformat() if hasattr(day, 'isoformat') else day,
+                  'action': mark.get('action')}
+        results.append(result)
+        try:
+            if result['action'] not in BULK_ACTIONS:
+                raise ValueError(f"action must be one of {', '.join(BULK_ACTIONS)}")
+            if not result['student_id']:
+                raise ValueError('student_id is required')
+            day = _parse_date(result['date'])
+        except ValueError as e:
+            result.update(result='error', message=str(e))
+            continue
+        valid.append((result, str(result['student_id']), day))
+
+    # Students and the records they already have on the requested days
+    student_ids = {student_id for _, student_id, _ in valid}
+    classes = {}
+    for chunk in chunked(student_ids):
+        classes.update(db.session.query(Student.id, Student.class_name).filter(Student.id.in_(chunk)))
+
+    existing = {}
+    days = [day for _, _, day in valid]
+    if days:
+        for chunk in chunked(student_ids):
+            records = db.session.query(
+                Attendance.id, Attendance.student_id, Attendance.date, Attendance.status
+            ).filter(
+                Attendance.student_id.in_(chunk), Attendance.date.between(min(days), max(days))
+            )
+            for record_id, student_id, day, status in records:
+                existing[(student_id, day)] = (record_id, status)
+
+    # Replay the marks against the current state
+    state = {key: True for key in existing}
+    for result, student_id, day in valid:
+        if student_id not in classes:
+            result.update(result='error', message='Student not found')
+            continue
+        key = (student_id, day)
+        present = result['action'] == 'mark_present'
+        if state.get(key, False) == present:
+            result['result'] = 'unchanged'
+        else:
+            state[key] = present
+            result['result'] = 'marked' if present else 'removed'
+
+    # Write only the net difference, timed like mark_present
+    now = datetime.now()
+    created_at = datetime.utcnow()
+    inserts = [key for key, present in state.items() if present and key not in existing]
+    deletes = [key for key, present in state.items() if not present and key in existing]
+
+    inserted = set()
+    for chunk in chunked(inserts):
+        inserted |= insert_attendance_or_ignore([
+            {'student_id': student_id, 'date': day, 'time': now.time(), 'status': 'present',
+             'created_at': created_at}
+            for student_id, day in chunk
+        ])
+    for chunk in chunked(deletes):
+        db.session.execute(
+            db.delete(Attendance).where(Attendance.id.in_([existing[key][0] for key in chunk]))
+            .execution_options(synchronize_session=False)
+        )
+
+    deltas = Counter()
+    for student_id, day in inserted:
+        deltas[(classes[student_id], day)] += 1
+    for key in deletes:
+        if existing[key][1] == 'present':
+            deltas[(classes[key[0]], key[1])] -= 1
+    for (class_name, day), delta in deltas.items():
+        adjust_daily_summary(class_name, day, delta)
+
+    return results, Counter(result['result'] for result in results)
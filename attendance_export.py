@@ -0,0 +1,228 @@
+import io
+import csv
+import zipfile
+from datetime import date, datetime
+from xml.sax.saxutils import escape
+
+from models import db, Attendance, Student
+
+EXPORT_COLUMNS = ('date', 'time', 'student_id', 'name', 'class_name', 'status')
+
+# Rows fetched per round trip; also the rows per chunk handed to the client
+EXPORT_BATCH_SIZE = 1000
+
+# format: (mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+def attendance_export_rows(class_name=None, date_from=None, date_to=None):
+    """
+    Attendance records joined with the student's name and class, oldest first.
+
+    The rows are streamed: ``yield_per`` makes PostgreSQL use a server-side
+    cursor (and other databases fetch in batches), so only one batch is in
+    memory however large the range is. Iterate inside an app context.
+
+    Args:
+        class_name: Only students of this class
+        date_from, date_to: Inclusive date range
+
+    Returns:
+        Result yielding rows in EXPORT_COLUMNS order
+    """
+    query = db.select(
+        Attendance.date, Attendance.time, Attendance.student_id,
+        Student.name, Student.class_name, Attendance.status
+    ).join(Student, Student.id == Attendance.student_id)
+
+    if class_name:
+        query = query.where(Student.class_name == class_name)
+    if date_from:
+        query = query.where(Attendance.date >= date_from)
+    if date_to:
+        query = query.where(Attendance.date <= date_to)
+
+    # (date, id) is indexed, so the rows come out in order without a sort
+    query = query.order_by(Attendance.date, Attendance.id)
+    return db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+def _batches(rows, size=EXPORT_BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def iter_csv(rows):
+    """Yields a UTF-8 CSV (header first) in chunks of EXPORT_BATCH_SIZE rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # The byte order mark makes Excel read the file as UTF-8
+    buffer.write('\ufeff')
+    writer.writerow(EXPORT_COLUMNS)
+
+    for batch in _batches(rows):
+        writer.writerows(
+            (day.isoformat(), time.strftime('%H:%M:%S') if time else '', student_id, name, class_name, status)
+            for day, time, student_id, name, class_name, status in batch
+        )
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+class _ChunkBuffer:
+    """Write-only, unseekable file that hands out what was written since the last drain"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Attendance" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '<Relationship Id="rId2" Target="styles.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+        '</Relationships>'
+    ),
+    # Cell style 1 is a date (built-in format 14), style 2 a time (21)
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="3">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="21" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '</cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+_XLSX_EPOCH = date(1899, 12, 30)
+
+def _xlsx_text(value):
+    if value is None:
+        return '<c/>'
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+def _xlsx_row(day, time, student_id, name, class_name, status):
+    cells = [f'<c s="1"><v>{(day - _XLSX_EPOCH).days}</v></c>']
+    if time is None:
+        cells.append('<c/>')
+    else:
+        seconds = time.hour * 3600 + time.minute * 60 + time.second
+        cells.append(f'<c s="2"><v>{seconds / 86400:.8f}</v></c>')
+    cells.extend(_xlsx_text(value) for value in (student_id, name, class_name, status))
+    return '<row>' + ''.join(cells) + '</row>'
+
+def iter_xlsx(rows):
+    """
+    Yields a one-sheet XLSX workbook in chunks of EXPORT_BATCH_SIZE rows.
+
+    The sheet is written with inline strings (no shared string table) into
+    a zip that is flushed to the caller as it grows, so memory stays
+    constant and no spreadsheet library is needed.
+    """
+    output = _ChunkBuffer()
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in _XLSX_PARTS.items():
+            workbook.writestr(name, content)
+        yield output.drain()
+
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<cols><col min="1" max="2" width="12" customWidth="1"/></cols><sheetData>'
+                '<row>' + ''.join(_xlsx_text(column) for column in EXPORT_COLUMNS) + '</row>'
+            ).encode('utf-8'))
+
+            for batch in _batches(rows):
+                sheet.write(''.join(_xlsx_row(*row) for row in batch).encode('utf-8'))
+                yield output.drain()
+
+            sheet.write(b'</sheetData></worksheet>')
+    yield output.drain()
+
+def export_filename(fmt, class_name=None, date_from=None, date_to=None):
+    """Download name such as attendance_10A_2025-01-01_2025-12-31.csv"""
+    parts = ['attendance']
+    if class_name:
+        parts.append(''.join(c if c.isalnum() or c in '-_' else '_' for c in class_name))
+    if date_from or date_to:
+        parts.append(date_from.isoformat() if date_from else 'start')
+        parts.append(date_to.isoformat() if date_to else datetime.now().date().isoformat())
+    return '_'.join(parts) + '.' + EXPORT_FORMATS[fmt][1]
+
+def iter_export(fmt, class_name=None, date_from=None, date_to=None):
+    """
+    Streams an attendance export.
+
+    Args:
+        fmt: 'csv' or 'xlsx'
+        class_name: Only students of this class
+        date_from, date_to: Inclusive date range
+
+    Returns:
+        Generator of bytes chunks
+
+    Raises:
+        ValueError: if ``fmt`` is not in EXPORT_FORMATS
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    rows = attendance_export_rows(class_name, date_from, date_to)
+    return iter_csv(rows) if fmt == 'csv' else iter_xlsx(rows)
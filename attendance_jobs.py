@@ -0,0 +1,247 @@
+import os
+import queue
+import uuid
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from attendance_summary import mark_present
+from encoding_cache import encoding_cache
+from face_utils import compare_faces, encode_face
+from image_utils import StageTimer, decode_image
+from models import db, AttendanceJob, Student
+
+logger = logging.getLogger(__name__)
+
+def verify_and_mark(student, image, timer, day=None):
+    """
+    Checks a captured face against the student's enrolled face and, if it
+    matches, marks the student present.
+
+    Shared by the synchronous attendance route and the job workers. The
+    caller's database connection is returned to the pool while the face is
+    encoded, which detaches ``student``; callers must not read its deferred
+    or expired attributes afterwards.
+
+    Args:
+        student: Student (needs id and class_name)
+        image: Decoded grayscale image
+        timer: StageTimer for the 'detect' and 'encode' stages
+        day: Attendance date (default: today)
+
+    Returns:
+        (category, message) to show the student, category being a flash
+        category ('success', 'info' or 'danger')
+    """
+    try:
+        stored_encoding, encoder_name = encoding_cache.get(student.id)
+    except Exception as e:
+        logger.error(f"Error loading stored face encoding: {str(e)}")
+        return 'danger', 'Error verifying face. Please contact administrator.'
+
+    if stored_encoding is None:
+        return 'danger', 'No registered face found. Please contact administrator.'
+
+    # Hand the connection back to the pool while the face is encoded;
+    # mark_present checks out a new one. This detaches the student: only
+    # its loaded columns (id, class_name) may be read from here on
+    db.session.close()
+
+    # Encode the captured face with the same encoder as the stored one
+    captured_face_encoding = encode_face(image, encoder=encoder_name, timer=timer)
+    timer.record()
+
+    if captured_face_encoding is None:
+        return 'danger', 'No face detected in the image. Please try again with a clear face position.'
+
+    # Compare faces with a stricter threshold
+    match = compare_faces(stored_encoding, captured_face_encoding, tolerance=0.5,  # Lower tolerance = stricter matching
+                          encoder=encoder_name)
+
+    if not match:
+        logger.warning(f"Face verification failed for student {student.id}")
+        return 'danger', 'Face verification failed. This does not appear to be the registered student.'
+
+    # The unique (student_id, date) index rejects a second mark for the day
+    try:
+        inserted = mark_present(student, day or date.today())
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Database error marking attendance: {str(e)}")
+        return 'danger', 'Error marking attendance. Please try again.'
+
+    if inserted:
+        return 'success', 'Your attendance has been marked successfully!'
+    return 'info', 'You have already marked your attendance for today'
+
+class AttendanceJobQueue:
+    """
+    Background face verification for attendance photos.
+
+    The request only stores the photo as a pending AttendanceJob row and
+    returns its ID; ``workers`` threads in the same process decode, detect,
+    encode and compare it, and write the result to the row, which the
+    client polls. OpenCV releases the GIL for the heavy work, so a few
+    threads keep a core busy without holding a web worker per photo.
+
+    Jobs live in the database, so any web worker can report on a job, and
+    a job whose process died before running it is picked up by another
+    process's periodic sweep once it is ``stale_after`` seconds old.
+    Threads start on the first submitted job in each process (after the
+    gunicorn fork).
+    """
+
+    def __init__(self, workers=2, sweep_interval=30, stale_after=30, running_timeout=300,
+                 keep_finished=86400):
+        self.workers = workers
+        self.sweep_interval = sweep_interval
+        self.stale_after = stale_after
+        self.running_timeout = running_timeout
+        self.keep_finished = keep_finished
+        self.app = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._last_sweep = time.monotonic()
+        self.processed = 0
+        self.failed = 0
+
+    def init_app(self, app):
+        """Use ``app`` (for the app context of the worker threads) and its ATTENDANCE_JOB_* config"""
+        self.app = app
+        self.workers = app.config.get('ATTENDANCE_JOB_WORKERS', self.workers)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Threads do not survive a fork, so start them in every process
+            self._pid = os.getpid()
+            self._queue = queue.Queue()
+            for number in range(self.workers):
+                threading.Thread(target=self._run, name=f'attendance-job-{number}', daemon=True).start()
+
+    def submit(self, student_id, image_bytes, day=None):
+        """
+        Queues an attendance photo. Commits the session.
+
+        Returns:
+            Job ID
+        """
+        job = AttendanceJob(id=uuid.uuid4().hex, student_id=student_id, date=day or date.today(),
+                            image=image_bytes, status='pending')
+        db.session.add(job)
+        db.session.commit()
+
+        self._ensure_started()
+        self._queue.put(job.id)
+        return job.id
+
+    def get(self, job_id, student_id=None):
+        """The job, or None if it does not exist (or belongs to another student)"""
+        job = db.session.get(AttendanceJob, job_id, options=[db.defer(AttendanceJob.image)])
+        if job is None or (student_id is not None and job.student_id != student_id):
+            return None
+        return job
+
+    def _claim(self, job_id):
+        """Marks a pending job as running; False if another thread got it first"""
+        result = db.session.execute(
+            db.update(AttendanceJob).where(
+                AttendanceJob.id == job_id, AttendanceJob.status == 'pending'
+            ).values(status='running', started_at=datetime.utcnow())
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def _finish(self, job_id, status, category, message):
+        db.session.execute(
+            db.update(AttendanceJob).where(AttendanceJob.id == job_id).values(
+                status=status, category=category, message=message,
+                image=None, finished_at=datetime.utcnow()
+            )
+        )
+        db.session.commit()
+
+    def process(self, job_id):
+        """Runs one job if it is still pending"""
+        if not self._claim(job_id):
+            return
+
+        job = db.session.get(AttendanceJob, job_id)
+        try:
+            student = Student.query.options(db.defer(Student.face_encoding)).get(job.student_id)
+            if student is None:
+                category, message = 'danger', 'Student not found'
+            else:
+                timer = StageTimer('attendance_job')
+                with timer.stage('decode'):
+                    image = decode_image(job.image)
+                if image is None:
+                    category, message = 'danger', 'Invalid image data provided'
+                else:
+                    category, message = verify_and_mark(student, image, timer, day=job.date)
+            self._finish(job_id, 'done', category, message)
+            self.processed += 1
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error processing attendance job {job_id}: {str(e)}")
+            self._finish(job_id, 'failed', 'danger', 'An error occurred. Please try again.')
+            self.failed += 1
+
+    def sweep(self):
+        """Queues orphaned pending jobs, fails stuck ones and deletes old results"""
+        self._last_sweep = time.monotonic()
+        now = datetime.utcnow()
+        orphans = db.session.query(AttendanceJob.id).filter(
+            AttendanceJob.status == 'pending',
+            AttendanceJob.created_at < now - timedelta(seconds=self.stale_after)
+        ).order_by(AttendanceJob.created_at).limit(100).all()
+        for job_id, in orphans:
+            self._queue.put(job_id)
+
+        db.session.execute(
+            db.update(AttendanceJob).where(
+                AttendanceJob.status == 'running',
+                AttendanceJob.started_at < now - timedelta(seconds=self.running_timeout)
+            ).values(status='failed', category='danger', image=None, finished_at=now,
+                     message='Processing took too long. Please try again.')
+        )
+        db.session.execute(
+            db.delete(AttendanceJob).where(
+                AttendanceJob.status.in_(('done', 'failed')),
+                AttendanceJob.finished_at < now - timedelta(seconds=self.keep_finished)
+            )
+        )
+        db.session.commit()
+
+    def _run(self):
+        while True:
+            try:
+                job_id = self._queue.get(timeout=self.sweep_interval)
+            except queue.Empty:
+                job_id = None
+
+            with self.app.app_context():
+                try:
+                    if job_id is not None:
+                        self.process(job_id)
+                    # Also sweep under constant load, when the queue never runs dry
+                    if time.monotonic() - self._last_sweep >= self.sweep_interval:
+                        self.sweep()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Attendance job worker error: {str(e)}")
+
+    def stats(self):
+        return {
+            'workers': self.workers if self._pid == os.getpid() else 0,
+            'queued': self._queue.qsize(),
+            'processed': self.processed,
+            'failed': self.failed
+        }
+
+# Shared job queue for this worker process; create_app calls init_app
+attendance_jobs = AttendanceJobQueue()
@@ -0,0 +1,252 @@
+import bisect
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import case, func, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Attendance, AttendanceDailySummary, Student
+
+logger = logging.getLogger(__name__)
+
+def enrolled_count(class_name, day):
+    """Number of students in ``class_name`` enrolled on or before ``day``"""
+    return Student.query.filter(
+        Student.class_name == class_name,
+        or_(Student.created_at.is_(None), Student.created_at < day + timedelta(days=1))
+    ).count()
+
+def _increment(class_name, day, delta):
+    """Adds ``delta`` to an existing summary row; returns False if there is none"""
+    result = db.session.execute(
+        db.update(AttendanceDailySummary).where(
+            AttendanceDailySummary.date == day,
+            AttendanceDailySummary.class_name == class_name
+        ).values(
+            present_count=AttendanceDailySummary.present_count + delta,
+            updated_at=datetime.utcnow()
+        ).execution_options(synchronize_session=False)
+    )
+    return result.rowcount > 0
+
+def adjust_daily_summary(class_name, day, delta):
+    """
+    Updates the daily summary after attendance was marked or removed.
+
+    Runs in the caller's transaction, so the summary commits (or rolls
+    back) together with the attendance change. The increment is a single
+    UPDATE, so concurrent workers do not lose counts.
+
+    Args:
+        class_name: Class of the student
+        day: Attendance date
+        delta: +1 for a new present record, -1 for a removed one
+    """
+    if not class_name or not delta:
+        return
+
+    if _increment(class_name, day, delta):
+        return
+    if delta < 0:
+        # Nothing recorded for that day yet; rebuild-attendance-summary repairs drift
+        logger.warning(f"No attendance summary for {class_name} on {day} to decrement")
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(AttendanceDailySummary(
+                date=day,
+                class_name=class_name,
+                present_count=delta,
+                enrolled_count=enrolled_count(class_name, day)
+            ))
+    except IntegrityError:
+        # Another worker created the row first
+        _increment(class_name, day, delta)
+
+def adjust_enrolment(class_name, enrolled_at, delta):
+    """
+    Updates the enrolled counts of the daily summary after students joined
+    or left a class (enrolment, deletion or a class change).
+
+    ``enrolled_count`` is captured when a day's row is created, so every
+    row from the students' enrolment day on is adjusted with one UPDATE.
+    Runs in the caller's transaction.
+
+    Args:
+        class_name: Class the students joined or left
+        enrolled_at: The students' created_at (None: enrolled before any record)
+        delta: Number of students who joined (negative if they left)
+    """
+    if not class_name or not delta:
+        return
+
+    conditions = [AttendanceDailySummary.class_name == class_name]
+    if enrolled_at is not None:
+        conditions.append(AttendanceDailySummary.date >= enrolled_at.date())
+    db.session.execute(
+        db.update(AttendanceDailySummary).where(*conditions).values(
+            enrolled_count=AttendanceDailySummary.enrolled_count + delta,
+            updated_at=datetime.utcnow()
+        ).execution_options(synchronize_session=False)
+    )
+
+def change_student_class(student, old_class_name):
+    """
+    Moves a student's enrolment and present days from ``old_class_name``
+    to their new ``class_name`` in the daily summary. Runs in the caller's
+    transaction, with the student's new class already set.
+    """
+    if student.class_name == old_class_name:
+        return
+
+    # Existing rows first: rows the move below creates already count the student
+    adjust_enrolment(old_class_name, student.created_at, -1)
+    adjust_enrolment(student.class_name, student.created_at, 1)
+
+    present_dates = db.session.query(Attendance.date).filter(
+        Attendance.student_id == student.id, Attendance.status == 'present'
+    ).all()
+    for day, in present_dates:
+        adjust_daily_summary(old_class_name, day, -1)
+        adjust_daily_summary(student.class_name, day, 1)
+
+def _insert_attendance_or_ignore(values):
+    """
+    INSERT of one attendance row that does nothing if (student_id, date)
+    already exists.
+
+    Returns:
+        True if the row was inserted
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        statement = insert(Attendance).values(**values).on_conflict_do_nothing(
+            index_elements=['student_id', 'date']
+        )
+    elif dialect in ('mysql', 'mariadb'):
+        statement = db.insert(Attendance).values(**values).prefix_with('IGNORE')
+    else:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(db.insert(Attendance).values(**values))
+            return True
+        except IntegrityError:
+            return False
+
+    return db.session.execute(statement).rowcount == 1
+
+def insert_attendance_or_ignore(rows):
+    """
+    ``_insert_attendance_or_ignore`` for many rows: one multi-row INSERT
+    on PostgreSQL and SQLite, which report the rows they inserted, and
+    one INSERT per row elsewhere.
+
+    Args:
+        rows: Attendance column values, one dict per row
+
+    Returns:
+        Set of the (student_id, date) pairs that were inserted
+    """
+    if not rows:
+        return set()
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in ('postgresql', 'sqlite'):
+        return {(values['student_id'], values['date']) for values in rows
+                if _insert_attendance_or_ignore(values)}
+
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    statement = insert(Attendance).on_conflict_do_nothing(
+        index_elements=['student_id', 'date']
+    ).returning(Attendance.student_id, Attendance.date)
+    return {(student_id, day) for student_id, day in db.session.execute(statement, rows)}
+
+def mark_present(student, day, time=None):
+    """
+    Records a student as present on ``day`` unless they already are.
+
+    Relies on the unique (student_id, date) index instead of a read before
+    the write, so two workers marking the same student at once cannot both
+    insert. The daily summary is updated only if a row was inserted. Runs
+    in the caller's transaction; the caller commits.
+
+    Args:
+        student: Student (needs id and class_name)
+        day: Attendance date
+        time: Time of day (default: now)
+
+    Returns:
+        True if attendance was recorded, False if it already existed
+    """
+    inserted = _insert_attendance_or_ignore({
+        'student_id': student.id,
+        'date': day,
+        'time': time or datetime.now().time(),
+        'status': 'present',
+        'created_at': datetime.utcnow()
+    })
+    if inserted:
+        adjust_daily_summary(student.class_name, day, 1)
+    return inserted
+
+def rebuild_daily_summary():
+    """
+    Recomputes the whole summary table from attendances and students.
+
+    The caller commits.
+
+    Returns:
+        Number of summary rows written
+    """
+    present = db.session.query(
+        Attendance.date,
+        Student.class_name,
+        func.sum(case((Attendance.status == 'present', 1), else_=0))
+    ).join(Student, Student.id == Attendance.student_id).group_by(
+        Attendance.date, Student.class_name
+    ).all()
+
+    # Enrolment dates per class, to count who was enrolled on each day
+    enrolled_on = defaultdict(list)
+    for class_name, created_at in db.session.query(Student.class_name, Student.created_at):
+        enrolled_on[class_name].append(created_at.date() if created_at else datetime.min.date())
+    for dates in enrolled_on.values():
+        dates.sort()
+
+    now = datetime.utcnow()
+    rows = [{
+        'date': day,
+        'class_name': class_name,
+        'present_count': int(present_count or 0),
+        'enrolled_count': bisect.bisect_right(enrolled_on[class_name], day),
+        'updated_at': now
+    } for day, class_name, present_count in present if class_name]
+
+    db.session.query(AttendanceDailySummary).delete()
+    if rows:
+        db.session.execute(db.insert(AttendanceDailySummary), rows)
+    return len(rows)
+
+def daily_totals(date_from=None):
+    """
+    Present and enrolled counts per day across all classes, oldest first.
+
+    Returns:
+        (dates as YYYY-MM-DD strings, present counts, enrolled counts)
+    """
+    query = db.session.query(
+        AttendanceDailySummary.date,
+        func.sum(AttendanceDailySummary.present_count),
+        func.sum(AttendanceDailySummary.enrolled_count)
+    )
+    if date_from:
+        query = query.filter(AttendanceDailySummary.date >= date_from)
+    rows = query.group_by(AttendanceDailySummary.date).order_by(AttendanceDailySummary.date).all()
+
+    dates = [day.strftime('%Y-%m-%d') for day, _, _ in rows]
+    present = [int(count or 0) for _, count, _ in rows]
+    enrolled = [int(count or 0) for _, _, count in rows]
+    return dates, present, enrolled
@@ -0,0 +1,98 @@
+"""
+Throughput benchmark for the batched face comparison functions.
+
+Compares calling compare_faces once per (probe, known) pair, as a loop over
+the enrolled students does, with compare_faces_batch, face_distances and
+nearest_faces on random encodings, checks the batched results against the
+scalar ones, and reports the peak memory of nearest_faces for several block
+sizes.
+
+Usage:
+    python benchmarks/bench_compare_faces.py --known 20000 --probes 500 --dim 324
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_utils import FaceEncoder, compare_faces, compare_faces_batch, face_distances, nearest_faces
+
+class BenchmarkEncoder(FaceEncoder):
+    name = 'benchmark'
+
+def timed(function, *args, **kwargs):
+    """Runs function once; returns (result, seconds)"""
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+def peak_memory(function, *args, **kwargs):
+    """Peak bytes allocated by one call of function"""
+    tracemalloc.start()
+    try:
+        function(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--known', type=int, default=20000)
+    parser.add_argument('--probes', type=int, default=500)
+    parser.add_argument('--dim', type=int, default=324)
+    parser.add_argument('--k', type=int, default=5, help='Neighbours per probe for nearest_faces')
+    parser.add_argument('--scalar-pairs', type=int, default=20000,
+                        help='Pairs timed with the scalar compare_faces')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    known = rng.standard_normal((args.known, args.dim)).astype(np.float32)
+    probes = rng.standard_normal((args.probes, args.dim)).astype(np.float32)
+    pairs = args.known * args.probes
+
+    # Put the threshold at the median distance so matches and misses are both exercised
+    sample = rng.integers(0, [args.probes, args.known], size=(args.scalar_pairs, 2))
+    threshold = float(np.median(np.linalg.norm(probes[sample[:, 0]] - known[sample[:, 1]], axis=1)))
+
+    # compare_faces takes its threshold from the encoder
+    encoder = BenchmarkEncoder()
+    encoder.threshold = threshold
+
+    scalar, scalar_s = timed(lambda: [compare_faces(known[j], probes[i], encoder=encoder) for i, j in sample])
+    batch, batch_s = timed(compare_faces_batch, known, probes, threshold=threshold)
+    distances, distances_s = timed(face_distances, known, probes)
+    (indices, nearest), nearest_s = timed(nearest_faces, known, probes, k=args.k)
+
+    disagreements = int(np.sum(np.asarray(scalar) != batch[sample[:, 0], sample[:, 1]]))
+    reference = np.linalg.norm(probes[sample[:, 0]].astype(np.float64) - known[sample[:, 1]], axis=1)
+    max_error = float(np.max(np.abs(distances[sample[:, 0], sample[:, 1]] - reference)))
+    best = np.argmin(distances, axis=1)
+    top1_agrees = float(np.mean(indices[:, 0] == best))
+
+    print(f"{args.known} known x {args.probes} probes x {args.dim} dimensions, float32\n")
+    print(f"{'function':>22} {'ns/pair':>10} {'speedup':>8}")
+    scalar_ns = scalar_s * 1e9 / args.scalar_pairs
+    for label, seconds in (('compare_faces (loop)', scalar_s * pairs / args.scalar_pairs),
+                           ('compare_faces_batch', batch_s),
+                           ('face_distances', distances_s),
+                           (f'nearest_faces k={args.k}', nearest_s)):
+        ns = seconds * 1e9 / pairs
+        print(f"{label:>22} {ns:>10.2f} {scalar_ns / ns:>7.1f}x")
+
+    print(f"\nMatch disagreements with compare_faces: {disagreements} of {args.scalar_pairs} pairs")
+    print(f"Largest distance error vs float64: {max_error:.2e}")
+    print(f"nearest_faces top-1 agrees with argmin of face_distances: {top1_agrees:.3f}\n")
+
+    print(f"{'block elements':>15} {'peak MB':>9} {'ms':>9}")
+    for block_elements in (256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024):
+        peak = peak_memory(nearest_faces, known, probes, k=args.k, block_elements=block_elements)
+        _, seconds = timed(nearest_faces, known, probes, k=args.k, block_elements=block_elements)
+        print(f"{block_elements:>15} {peak / 2**20:>9.1f} {seconds * 1000:>9.1f}")
+
+if __name__ == "__main__":
+    main()
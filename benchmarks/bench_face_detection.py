@@ -0,0 +1,68 @@
+"""
+Face detection latency across frame resolutions.
+
+Compares the original full-resolution detectMultiScale(gray, 1.3, 5) call
+with the downscale-then-detect FaceDetector pipeline, with and without an
+ROI hint from the previous frame. The input photo is resized to each
+target resolution so the face keeps the same relative size.
+
+Usage:
+    python benchmarks/bench_face_detection.py --image path/to/face.jpg
+"""
+import os
+import sys
+import time
+import argparse
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_utils import FaceDetector, detectors
+
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080), (2560, 1440), (3840, 2160)]
+
+def time_call(fn, repeats):
+    """Returns (last result, mean milliseconds per call)"""
+    result = fn()
+    started = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return result, (time.perf_counter() - started) * 1000 / repeats
+
+def letterbox(image, width, height):
+    """Scales ``image`` to fit width x height and pads it to that size"""
+    scale = min(width / image.shape[1], height / image.shape[0])
+    resized = cv2.resize(image, (round(image.shape[1] * scale), round(image.shape[0] * scale)))
+    top = (height - resized.shape[0]) // 2
+    left = (width - resized.shape[1]) // 2
+    return cv2.copyMakeBorder(resized, top, height - resized.shape[0] - top,
+                              left, width - resized.shape[1] - left, cv2.BORDER_CONSTANT)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--image', required=True, help='Photo containing one face')
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--max-side', type=int, default=480)
+    args = parser.parse_args()
+
+    image = cv2.imread(args.image)
+    if image is None:
+        parser.error(f"Could not read {args.image}")
+
+    cascade = detectors.get('face')
+    detector = FaceDetector(max_side=args.max_side)
+
+    print(f"{'resolution':>11} {'full-res ms':>12} {'pipeline ms':>12} {'with ROI ms':>12} {'speedup':>8}")
+    for width, height in RESOLUTIONS:
+        gray = cv2.cvtColor(letterbox(image, width, height), cv2.COLOR_BGR2GRAY)
+
+        full, full_ms = time_call(lambda: cascade.detectMultiScale(gray, 1.3, 5), args.repeats)
+        box, pipeline_ms = time_call(lambda: detector.detect(gray), args.repeats)
+        hinted, roi_ms = time_call(lambda: detector.detect(gray, roi_hint=box), args.repeats)
+
+        found = f"{len(full)}/{int(box is not None)}/{int(hinted is not None)}"
+        print(f"{width:>5}x{height:<5} {full_ms:>12.1f} {pipeline_ms:>12.1f} {roi_ms:>12.1f} "
+              f"{full_ms / pipeline_ms:>7.1f}x  faces found {found}")
+
+if __name__ == "__main__":
+    main()
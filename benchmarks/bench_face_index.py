@@ -0,0 +1,81 @@
+"""
+Recall-versus-latency benchmark for the approximate face index.
+
+Compares IVFIndex at several n_probe settings against exact brute-force
+search on synthetic encodings. Raw-pixel face crops are strongly low-rank,
+so the synthetic data is a random low-rank signal plus per-capture noise:
+every enrolled student gets one encoding and each query is a fresh noisy
+capture of an enrolled student.
+
+Usage:
+    python benchmarks/bench_face_index.py --students 20000 --dim 10000
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_index import ExactIndex, IVFIndex
+
+def make_encodings(students, dim, rank, noise, queries, seed):
+    """Synthetic enrolled encodings and noisy re-captures of some of them"""
+    rng = np.random.default_rng(seed)
+    basis = rng.standard_normal((rank, dim)).astype(np.float32) / np.sqrt(rank)
+    identities = rng.standard_normal((students, rank)).astype(np.float32)
+
+    enrolled = identities @ basis + noise * rng.standard_normal((students, dim)).astype(np.float32)
+
+    targets = rng.choice(students, queries, replace=False)
+    probes = identities[targets] @ basis + noise * rng.standard_normal((queries, dim)).astype(np.float32)
+
+    return [f'S{i:06d}' for i in range(students)], enrolled, targets, probes
+
+def time_searches(index, probes, **search_args):
+    """Runs every probe through the index; returns (results, ms per query)"""
+    started = time.perf_counter()
+    results = [index.search(probe, k=1, **search_args) for probe in probes]
+    elapsed = time.perf_counter() - started
+    return results, elapsed * 1000 / len(probes)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--dim', type=int, default=10000)
+    parser.add_argument('--rank', type=int, default=64, help='Rank of the synthetic face signal')
+    parser.add_argument('--noise', type=float, default=0.3, help='Per-capture noise level')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--components', type=int, default=128)
+    parser.add_argument('--lists', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"Generating {args.students} x {args.dim} encodings...")
+    ids, enrolled, targets, probes = make_encodings(args.students, args.dim, args.rank,
+                                                    args.noise, args.queries, args.seed)
+
+    exact = ExactIndex().build(ids, enrolled)
+    exact_results, exact_ms = time_searches(exact, probes)
+    truth = [result[0][0] for result in exact_results]
+    exact_accuracy = np.mean([truth[i] == ids[t] for i, t in enumerate(targets)])
+
+    started = time.perf_counter()
+    ivf = IVFIndex(n_components=args.components, n_lists=args.lists, seed=args.seed).build(ids, enrolled)
+    build_s = time.perf_counter() - started
+    n_lists = len(ivf.centroids)
+
+    print(f"\nExact search: {exact_ms:.2f} ms/query, identification accuracy {exact_accuracy:.3f}")
+    print(f"IVF build ({args.components} components, {n_lists} lists): {build_s:.1f}s\n")
+    print(f"{'n_probe':>8} {'recall@1':>10} {'ms/query':>10} {'speedup':>8}")
+
+    for n_probe in sorted({1, 2, 4, 8, 16, 32, n_lists}):
+        if n_probe > n_lists:
+            continue
+        results, ms = time_searches(ivf, probes, n_probe=n_probe)
+        recall = np.mean([bool(result) and result[0][0] == truth[i] for i, result in enumerate(results)])
+        print(f"{n_probe:>8} {recall:>10.3f} {ms:>10.2f} {exact_ms / ms:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
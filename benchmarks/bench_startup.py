@@ -0,0 +1,97 @@
+"""
+Worker startup cost: app import, face detector warm-up and fork-to-ready.
+
+Every measurement runs in a fresh interpreter so nothing is already
+imported. "import" is `import main` (create_app included); it reports the
+SQL statements executed and whether cv2 was loaded, both of which should
+be none. "fork" mimics gunicorn with preload_app: the parent imports and
+warms up once, then each forked child runs post_worker_init and serves a
+first request. "no preload" does the import and warm-up in the child.
+
+Usage:
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in a fresh interpreter; prints one JSON line of timings in milliseconds
+PROBE = r'''
+import os, sys, json, time
+sys.path.insert(0, ROOT)
+started = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+statements = []
+event.listen(Engine, 'before_cursor_execute', lambda *a: statements.append(1))
+import_started = time.perf_counter()
+import main
+result = {'import': (time.perf_counter() - import_started) * 1000,
+          'statements': len(statements), 'cv2_loaded': 'cv2' in sys.modules}
+
+from face_utils import warm_up
+warm_started = time.perf_counter()
+warm_up()
+result['warm_up'] = (time.perf_counter() - warm_started) * 1000
+
+def first_request():
+    client = main.app.test_client()
+    assert client.get('/').status_code == 200
+
+if MODE == 'fork':
+    fork_times = []
+    for _ in range(REPEAT):
+        read_fd, write_fd = os.pipe()
+        fork_started = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            warm_up()  # post_worker_init
+            first_request()
+            os.write(write_fd, b'x')
+            os._exit(0)
+        os.read(read_fd, 1)
+        fork_times.append((time.perf_counter() - fork_started) * 1000)
+        os.waitpid(pid, 0)
+        os.close(read_fd)
+        os.close(write_fd)
+    result['fork'] = fork_times
+else:
+    request_started = time.perf_counter()
+    first_request()
+    result['first_request'] = (time.perf_counter() - request_started) * 1000
+    result['total'] = (time.perf_counter() - started) * 1000
+print(json.dumps(result))
+'''
+
+def probe(mode, repeat, env):
+    source = f"ROOT = {ROOT!r}\nMODE = {mode!r}\nREPEAT = {repeat}\n" + PROBE
+    output = subprocess.run([sys.executable, '-c', source], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    env = dict(os.environ, DATABASE_URL='sqlite://', GUNICORN_PRELOAD='true')
+
+    cold = [probe('cold', 1, env) for _ in range(args.repeat)]
+    forked = probe('fork', args.repeat, env)
+
+    median = lambda key: statistics.median(run[key] for run in cold)
+    print(f"{'measure':>26} {'ms (median)':>12}")
+    print(f"{'import main':>26} {median('import'):>12.1f}")
+    print(f"{'  SQL statements at import':>26} {max(run['statements'] for run in cold):>12}")
+    print(f"{'  cv2 loaded at import':>26} {str(any(run['cv2_loaded'] for run in cold)):>12}")
+    print(f"{'warm_up (cv2 + cascades)':>26} {median('warm_up'):>12.1f}")
+    print(f"{'no preload: worker ready':>26} {median('total'):>12.1f}")
+    print(f"{'preload: fork to ready':>26} {statistics.median(forked['fork']):>12.1f}")
+
+if __name__ == '__main__':
+    main()
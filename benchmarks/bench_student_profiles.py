@@ -0,0 +1,112 @@
+"""
+Query-count and latency benchmark for the admin student profiles page.
+
+Fills a throwaway SQLite database with synthetic students and attendance,
+then requests /admin/student_profiles through the Flask test client while
+counting the SQL statements each request executes. The aggregate query
+keeps the count constant as the roster grows; --legacy also times the old
+per-student loop (three queries per student) for comparison.
+
+Usage:
+    python benchmarks/bench_student_profiles.py --students 1000 10000 --legacy
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import date, time as dtime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def populate(db, Student, Attendance, students, days, seed):
+    """Bulk-inserts students and roughly 80% attendance over ``days`` days"""
+    rng = random.Random(seed)
+    db.session.query(Attendance).delete()
+    db.session.query(Student).delete()
+
+    classes = [f'Class {i}' for i in range(20)]
+    db.session.execute(db.insert(Student), [
+        {'id': f'S{i:06d}', 'name': f'Student {rng.randrange(10**6):06d}', 'password_hash': 'x',
+         'class_name': rng.choice(classes)}
+        for i in range(students)
+    ])
+
+    start = date.today() - timedelta(days=days)
+    records = []
+    for i in range(students):
+        for day in range(days):
+            if rng.random() < 0.8:
+                records.append({'student_id': f'S{i:06d}', 'date': start + timedelta(days=day),
+                                'time': dtime(9, 0), 'status': 'present'})
+    for offset in range(0, len(records), 50000):
+        db.session.execute(db.insert(Attendance), records[offset:offset + 50000])
+    db.session.commit()
+    return len(records)
+
+def legacy_profiles(Student, Attendance):
+    """The previous implementation: everything in Python, 3N+2 queries"""
+    students = Student.query.all()
+    sorted(set(s.class_name for s in Student.query.all() if s.class_name))
+    for student in students:
+        total_days = Attendance.query.filter_by(student_id=student.id).count()
+        if total_days > 0:
+            Attendance.query.filter_by(student_id=student.id, status='present').count()
+        Attendance.query.filter_by(student_id=student.id).order_by(Attendance.date.desc()).first()
+    students.sort(key=lambda x: x.name)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--days', type=int, default=30, help='Days of attendance per student')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--legacy', action='store_true', help='Also time the old per-student loop')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_profiles_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    import logging
+    from sqlalchemy import event
+    from app import create_app
+    from migrations import upgrade
+    from models import db, Student, Attendance
+    logging.disable(logging.WARNING)
+
+    app = create_app()
+    statements = []
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['is_admin'] = True
+
+    print(f"{'students':>9} {'records':>9} {'view':>10} {'queries':>8} {'ms/request':>11}")
+    with app.app_context():
+        upgrade(echo=lambda line: None)
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: statements.append(1))
+
+        for students in args.students:
+            records = populate(db, Student, Attendance, students, args.days, args.seed)
+
+            views = [('page 1', '/admin/student_profiles?sort=name'),
+                     ('by att.', '/admin/student_profiles?sort=attendance&page=3'),
+                     ('search', '/admin/student_profiles?search=12&class=Class+3')]
+            for label, url in views:
+                assert client.get(url).status_code == 200
+                statements.clear()
+                started = time.perf_counter()
+                for _ in range(args.repeat):
+                    client.get(url)
+                elapsed = (time.perf_counter() - started) * 1000 / args.repeat
+                print(f"{students:>9} {records:>9} {label:>10} {len(statements) // args.repeat:>8} {elapsed:>11.1f}")
+
+            if args.legacy:
+                statements.clear()
+                started = time.perf_counter()
+                legacy_profiles(Student, Attendance)
+                elapsed = (time.perf_counter() - started) * 1000
+                print(f"{students:>9} {records:>9} {'legacy':>10} {len(statements):>8} {elapsed:>11.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Match-threshold calibration for the face encoders.
+
+Encodes a folder of labelled photos with each encoder, computes the
+distance of every same-person (genuine) and different-person (impostor)
+pair, and reports the false-accept and false-reject rates at the
+encoder's current threshold and at the threshold reaching each target
+false-accept rate. Photos are laid out one folder per person:
+
+    photos/
+        alice/1.jpg, alice/2.jpg, ...
+        bob/1.jpg, ...
+
+Usage:
+    python benchmarks/calibrate_encoder.py photos/ --encoder hog-v1 --encoder pixels-v1
+"""
+import os
+import sys
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_utils import ENCODERS, encode_face, face_distances, get_encoder
+from image_utils import decode_image
+
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.pgm')
+
+def load_photos(root):
+    """(person, image) pairs for every decodable photo under root/<person>/"""
+    photos = []
+    for person in sorted(os.listdir(root)):
+        folder = os.path.join(root, person)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if os.path.splitext(name)[1].lower() not in PHOTO_EXTENSIONS:
+                continue
+            with open(os.path.join(folder, name), 'rb') as f:
+                image = decode_image(f.read())
+            if image is not None:
+                photos.append((person, image))
+    return photos
+
+def pair_distances(photos, encoder):
+    """Genuine and impostor distances of every pair of photos with a detected face"""
+    people = []
+    encodings = []
+    for person, image in photos:
+        encoding = encode_face(image, encoder=encoder)
+        if encoding is not None:
+            people.append(person)
+            encodings.append(encoding)
+
+    people = np.array(people)
+    distances = face_distances(np.vstack(encodings), np.vstack(encodings))
+    upper = np.triu_indices(len(people), k=1)
+    same = people[upper[0]] == people[upper[1]]
+    pairs = distances[upper]
+    return pairs[same], pairs[~same], len(photos) - len(people)
+
+def rates(genuine, impostor, threshold):
+    """(false-accept rate, false-reject rate) when matching below threshold"""
+    return float(np.mean(impostor < threshold)), float(np.mean(genuine >= threshold))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('photos', help='Folder with one sub-folder of photos per person')
+    parser.add_argument('--encoder', action='append', choices=sorted(ENCODERS),
+                        help='Encoder to calibrate (repeatable, default: all)')
+    parser.add_argument('--far', type=float, action='append',
+                        help='Target false-accept rate (repeatable, default: 0.01 and 0.001)')
+    args = parser.parse_args()
+
+    photos = load_photos(args.photos)
+    print(f"{len(photos)} photos of {len({person for person, _ in photos})} people")
+
+    for name in args.encoder or sorted(ENCODERS):
+        encoder = get_encoder(name)
+        genuine, impostor, undetected = pair_distances(photos, encoder)
+        print(f"\n{name}: {len(genuine)} genuine and {len(impostor)} impostor pairs, "
+              f"{undetected} photos without a detected face")
+        if not len(genuine) or not len(impostor):
+            print("  Needs at least two photos of one person and photos of two people")
+            continue
+
+        print(f"{'threshold':>12} {'FAR':>8} {'FRR':>8}")
+        far, frr = rates(genuine, impostor, encoder.threshold)
+        print(f"{encoder.threshold:>12.4f} {far:>8.4f} {frr:>8.4f}  (current)")
+        for target in sorted(args.far or [0.01, 0.001], reverse=True):
+            # Largest threshold accepting at most the target share of impostors
+            threshold = float(np.quantile(impostor, target, method='lower'))
+            far, frr = rates(genuine, impostor, threshold)
+            print(f"{threshold:>12.4f} {far:>8.4f} {frr:>8.4f}  (FAR <= {target})")
+
+if __name__ == "__main__":
+    main()
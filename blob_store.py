@@ -0,0 +1,141 @@
+import os
+import re
+import hashlib
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+_KEY_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# Leading bytes of the image formats we store, for the Content-Type header
+_IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF8', 'image/gif'),
+]
+
+def blob_key(data):
+    """Content address of a blob (hex SHA-256)"""
+    return hashlib.sha256(data).hexdigest()
+
+def is_blob_key(key):
+    return bool(key) and _KEY_PATTERN.match(key) is not None
+
+def guess_mimetype(data):
+    """Content-Type of an image blob, from its leading bytes"""
+    for signature, mimetype in _IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return mimetype
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'application/octet-stream'
+
+class BlobStore:
+    """
+    Content-addressed storage for binary blobs such as profile images.
+
+    A blob is stored under the SHA-256 of its bytes, so identical images are
+    only stored once and a key never changes meaning, which lets HTTP
+    responses for it be cached indefinitely.
+    """
+
+    kind = None
+
+    def put(self, data):
+        """
+        Stores a blob.
+
+        Args:
+            data: Blob bytes
+
+        Returns:
+            key: Hex SHA-256 of the data
+        """
+        raise NotImplementedError
+
+    def get(self, key):
+        """Returns the blob bytes, or None if there is no blob with this key"""
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Removes a blob; missing keys are ignored"""
+        raise NotImplementedError
+
+    def keys(self):
+        """Iterates over every stored key"""
+        raise NotImplementedError
+
+class LocalBlobStore(BlobStore):
+    """Blobs as files under ``root``, sharded by the first two key bytes (ab/cd/abcd...)"""
+
+    kind = 'local'
+
+    def __init__(self, root=None):
+        self.root = root
+
+    def _path(self, key):
+        if not is_blob_key(key):
+            raise ValueError(f"Invalid blob key: {key!r}")
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, data):
+        key = blob_key(data)
+        path = self._path(key)
+        if os.path.exists(path):
+            return key
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        # Write to a temporary file and rename so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return key
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def keys(self):
+        if not os.path.isdir(self.root):
+            return
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if is_blob_key(filename):
+                    yield filename
+
+BLOB_BACKENDS = {
+    LocalBlobStore.kind: LocalBlobStore,
+}
+
+def create_blob_store(kind='local', **params):
+    """Creates a blob store of the given backend ('local')"""
+    if kind not in BLOB_BACKENDS:
+        raise ValueError(f"Unknown blob store backend: {kind}")
+    return BLOB_BACKENDS[kind](**params)
+
+# Shared blob store; the app sets its root (BLOB_STORE_PATH)
+blob_store = create_blob_store(os.environ.get('BLOB_STORE_BACKEND', 'local'))
@@ -0,0 +1,307 @@
+import os
+import csv
+import json
+import time
+import click
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from flask.cli import with_appcontext
+
+from attendance_export import EXPORT_FORMATS, iter_export
+from attendance_summary import rebuild_daily_summary
+from blob_store import blob_store
+from face_index import create_index
+from migrations import MIGRATIONS, applied_versions, upgrade
+from student_import import encode_profile_image, import_students, init_encoding_worker, open_photo_archive, parse_roster
+from thumbnails import thumbnail_cache
+from face_utils import DEFAULT_ENCODER, encoding_encoder_name, unpack_encoding
+from models import db, Student, StudentRegistrationRequest
+
+@click.command('rebuild-face-index')
+@click.option('--kind', default=None, help="Index type ('ivf' or 'exact'), defaults to FACE_INDEX_TYPE")
+@click.option('--components', default=128, show_default=True, help='PCA dimensions (ivf only)')
+@click.option('--lists', default=None, type=int, help='Number of IVF lists (default: sqrt(N))')
+@click.option('--probe', default=8, show_default=True, help='Lists scanned per search (ivf only)')
+@with_appcontext
+def rebuild_face_index_command(kind, components, lists, probe):
+    """Rebuild the approximate face index from every stored encoding."""
+    kind = kind or current_app.config['FACE_INDEX_TYPE']
+    path = current_app.config['FACE_INDEX_PATH']
+    started = time.perf_counter()
+
+    ids = []
+    vectors = []
+    query = db.session.query(Student.id, Student.face_encoding).filter(
+        Student.face_encoding.isnot(None)
+    ).execution_options(yield_per=500)
+    for student_id, face_encoding in query:
+        # Encodings awaiting re-encoding have a different dimensionality
+        if encoding_encoder_name(face_encoding) != DEFAULT_ENCODER:
+            continue
+        ids.append(student_id)
+        vectors.append(np.asarray(unpack_encoding(face_encoding), dtype=np.float32).ravel())
+
+    if not ids:
+        click.echo('No stored face encodings; nothing to index.')
+        return
+
+    if kind == 'ivf':
+        index = create_index(kind, n_components=components, n_lists=lists, n_probe=probe)
+    else:
+        index = create_index(kind)
+    index.build(ids, np.vstack(vectors))
+    index.save(path)
+
+    click.echo(f'Built {kind} index over {len(ids)} encodings in '
+               f'{time.perf_counter() - started:.1f}s and saved it to {path}')
+
+def _load_checkpoint(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return None
+
+def _save_checkpoint(path, checkpoint):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def _fetch_reencode_page(after_id, batch_size, encoder, reencode_all):
+    """
+    Next page of (id, profile image bytes) pairs that need re-encoding.
+
+    Returns:
+        (page, last ID scanned or None when done, number of rows scanned)
+    """
+    query = db.session.query(Student.id, Student.profile_image_key, Student.face_encoding).filter(
+        Student.profile_image_key.isnot(None)
+    )
+    if after_id is not None:
+        query = query.filter(Student.id > after_id)
+    rows = query.order_by(Student.id).limit(batch_size).all()
+
+    if not rows:
+        return [], None, 0
+
+    page = []
+    for student_id, profile_image_key, face_encoding in rows:
+        if not reencode_all and encoding_encoder_name(face_encoding) == encoder:
+            continue
+        image_bytes = blob_store.get(profile_image_key)
+        if image_bytes is None:
+            click.echo(f"  {student_id}: profile image {profile_image_key} is missing from the blob store", err=True)
+            continue
+        page.append((student_id, image_bytes))
+    return page, rows[-1][0], len(rows)
+
+@click.command('reencode-faces')
+@click.option('--encoder', default=None, help='Target encoder, defaults to FACE_ENCODER')
+@click.option('--batch-size', default=200, show_default=True, help='Students per page and per UPDATE batch')
+@click.option('--workers', default=None, type=int, help='Worker processes (default: CPU count)')
+@click.option('--checkpoint', 'checkpoint_path', default=None,
+              help='Checkpoint file (default: instance/reencode_checkpoint.json)')
+@click.option('--all', 'reencode_all', is_flag=True, help='Also re-encode students already on the target encoder')
+@click.option('--restart', is_flag=True, help='Ignore any existing checkpoint')
+@with_appcontext
+def reencode_faces_command(encoder, batch_size, workers, checkpoint_path, reencode_all, restart):
+    """Recompute stored face encodings from the students' profile images."""
+    encoder = encoder or DEFAULT_ENCODER
+    checkpoint_path = checkpoint_path or os.path.join(current_app.instance_path, 'reencode_checkpoint.json')
+
+    checkpoint = None if restart else _load_checkpoint(checkpoint_path)
+    if checkpoint and checkpoint.get('encoder') != encoder:
+        click.echo(f"Checkpoint is for encoder {checkpoint.get('encoder')}, starting over")
+        checkpoint = None
+    if checkpoint is None:
+        checkpoint = {'encoder': encoder, 'last_id': None, 'updated': 0, 'failed': 0}
+    elif checkpoint['last_id'] is not None:
+        click.echo(f"Resuming after student {checkpoint['last_id']}")
+
+    remaining_query = Student.query.filter(Student.profile_image_key.isnot(None))
+    if checkpoint['last_id'] is not None:
+        remaining_query = remaining_query.filter(Student.id > checkpoint['last_id'])
+    total = remaining_query.count()
+    click.echo(f"Scanning {total} students with profile images for encoder {encoder}")
+
+    scanned = 0
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_encoding_worker) as pool:
+        def submit(page):
+            return [pool.submit(encode_profile_image, student_id, image_bytes, encoder)
+                    for student_id, image_bytes in page]
+
+        page, page_last_id, page_scanned = _fetch_reencode_page(checkpoint['last_id'], batch_size,
+                                                                encoder, reencode_all)
+        futures = submit(page)
+
+        while page_last_id is not None:
+            # Queue the next page so the pool stays busy while this one is written
+            next_page, next_last_id, next_scanned = _fetch_reencode_page(page_last_id, batch_size,
+                                                                         encoder, reencode_all)
+            next_futures = submit(next_page)
+
+            updates = []
+            for future in futures:
+                student_id, packed, error = future.result()
+                if packed is None:
+                    checkpoint['failed'] += 1
+                    click.echo(f"  {student_id}: {error}", err=True)
+                else:
+                    updates.append({'id': student_id, 'face_encoding': packed})
+
+            if updates:
+                db.session.execute(db.update(Student), updates)
+            db.session.commit()
+
+            checkpoint['updated'] += len(updates)
+            checkpoint['last_id'] = page_last_id
+            _save_checkpoint(checkpoint_path, checkpoint)
+
+            scanned += page_scanned
+            elapsed = time.perf_counter() - started
+            rate = scanned / elapsed if elapsed > 0 else 0
+            eta = (total - scanned) / rate if rate > 0 else 0
+            click.echo(f"{scanned}/{total} scanned, {checkpoint['updated']} updated, "
+                       f"{checkpoint['failed']} failed, {rate:.1f} students/s, ETA {eta:.0f}s")
+
+            page, page_last_id, page_scanned = next_page, next_last_id, next_scanned
+            futures = next_futures
+
+    # Finished, so the next run starts from the beginning
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    click.echo(f"Done: {checkpoint['updated']} re-encoded, {checkpoint['failed']} failed in "
+               f"{time.perf_counter() - started:.1f}s. Run 'flask rebuild-face-index' to refresh the index.")
+
+@click.command('import-students')
+@click.argument('roster', type=click.File('r', encoding='utf-8-sig'))
+@click.argument('photos', type=click.Path(exists=True, dir_okay=False))
+@click.option('--workers', default=None, type=int, help='Worker processes (default: CPU count)')
+@click.option('--batch-size', default=100, show_default=True, help='Students per INSERT transaction')
+@click.option('--report', type=click.File('w'), default=None, help='Write the per-row results to this CSV')
+@with_appcontext
+def import_students_command(roster, photos, workers, batch_size, report):
+    """Enrol the students of a roster CSV with their photos from a ZIP.
+
+    The roster needs student_id, name, class_name and password columns and
+    may have email and photo columns; photos are matched by file name, by
+    default the student ID (e.g. S001.jpg).
+    """
+    try:
+        rows = parse_roster(roster.read())
+        archive = open_photo_archive(photos)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+    started = time.perf_counter()
+
+    def progress(done, total):
+        elapsed = time.perf_counter() - started
+        rate = done / elapsed if elapsed > 0 else 0
+        eta = (total - done) / rate if rate > 0 else 0
+        click.echo(f"{done}/{total} encoded, {rate:.1f} students/s, ETA {eta:.0f}s")
+
+    with archive:
+        results, counts = import_students(rows, archive, workers=workers, batch_size=batch_size,
+                                          progress=progress)
+
+    for result in results:
+        if result['result'] == 'error':
+            click.echo(f"  row {result['row']} {result['student_id']}: {result['message']}", err=True)
+    if report:
+        writer = csv.DictWriter(report, fieldnames=['row', 'student_id', 'name', 'result', 'message'])
+        writer.writeheader()
+        writer.writerows(results)
+
+    click.echo(f"Imported {counts['imported']} students, {counts['error']} failed in "
+               f"{time.perf_counter() - started:.1f}s. Run 'flask rebuild-face-index' to refresh the index.")
+
+@click.command('prune-blobs')
+@click.option('--dry-run', is_flag=True, help='Only report what would be deleted')
+@with_appcontext
+def prune_blobs_command(dry_run):
+    """Delete stored images no student or registration request refers to.
+
+    Images are stored before their row is committed, so run this while no
+    enrolments or registrations are in progress.
+    """
+    referenced = set()
+    for model in (Student, StudentRegistrationRequest):
+        query = db.session.query(model.profile_image_key).filter(model.profile_image_key.isnot(None))
+        referenced.update(key for key, in query)
+
+    pruned = 0
+    for key in list(blob_store.keys()):
+        if key in referenced:
+            continue
+        if not dry_run:
+            blob_store.delete(key)
+            thumbnail_cache.delete(key)
+        pruned += 1
+
+    action = 'Would delete' if dry_run else 'Deleted'
+    click.echo(f"{action} {pruned} unreferenced blobs, {len(referenced)} in use")
+
+@click.command('rebuild-attendance-summary')
+@with_appcontext
+def rebuild_attendance_summary_command():
+    """Recompute the daily attendance summary from the attendance records."""
+    started = time.perf_counter()
+    rows = rebuild_daily_summary()
+    db.session.commit()
+    click.echo(f"Wrote {rows} daily summary rows in {time.perf_counter() - started:.1f}s")
+
+@click.command('export-attendance')
+@click.option('--format', 'fmt', type=click.Choice(list(EXPORT_FORMATS)), default='csv', show_default=True)
+@click.option('--class', 'class_name', default=None, help='Only this class')
+@click.option('--from', 'date_from', type=click.DateTime(['%Y-%m-%d']), default=None, help='First date (YYYY-MM-DD)')
+@click.option('--to', 'date_to', type=click.DateTime(['%Y-%m-%d']), default=None, help='Last date (YYYY-MM-DD)')
+@click.option('--output', '-o', type=click.File('wb'), default='-', help='Output file (default: stdout)')
+@with_appcontext
+def export_attendance_command(fmt, class_name, date_from, date_to, output):
+    """Export attendance records with student names and classes."""
+    chunks = iter_export(fmt, class_name, date_from and date_from.date(), date_to and date_to.date())
+    for chunk in chunks:
+        output.write(chunk)
+    output.flush()
+
+@click.command('upgrade')
+@click.option('--to', 'target', default=None, help='Stop after this migration version')
+@with_appcontext
+def upgrade_command(target):
+    """Apply the pending database migrations.
+
+    Run once per deploy, before starting the workers; the app itself never
+    changes the schema.
+    """
+    if target is not None and target not in {version for version, _, _ in MIGRATIONS}:
+        raise click.BadParameter(f"Unknown migration version: {target}", param_hint='--to')
+
+    try:
+        applied = upgrade(target, echo=click.echo)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Applied {applied} migrations" if applied else "Database is up to date")
+
+@click.command('db-status')
+@with_appcontext
+def db_status_command():
+    """List the database migrations and whether each is applied."""
+    applied = applied_versions()
+    for version, description, _ in MIGRATIONS:
+        state = 'applied' if version in applied else 'pending'
+        click.echo(f"{version} {state:>8}  {description}")
+
+def register_commands(app):
+    """Register the management commands on the Flask CLI"""
+    app.cli.add_command(rebuild_face_index_command)
+    app.cli.add_command(reencode_faces_command)
+    app.cli.add_command(import_students_command)
+    app.cli.add_command(prune_blobs_command)
+    app.cli.add_command(rebuild_attendance_summary_command)
+    app.cli.add_command(export_attendance_command)
+    app.cli.add_command(upgrade_command)
+    app.cli.add_command(db_status_command)
@@ -0,0 +1,71 @@
+import os
+
+def env_int(name, default):
+    """Integer environment variable, or ``default`` if unset"""
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+def database_url(default=None):
+    """DATABASE_URL from the environment, with postgres:// spelled postgresql://"""
+    url = os.environ.get('DATABASE_URL', default)
+    if url and url.startswith('postgres://'):
+        url = url.replace('postgres://', 'postgresql://', 1)
+    return url
+
+class Config:
+    """Settings shared by every profile; paths left as None default to the instance folder"""
+    SECRET_KEY = os.environ.get('SESSION_SECRET', 'dev-secret-key')
+
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool per worker process (see db_pool.engine_options). Every
+    # worker may open DB_POOL_SIZE + DB_MAX_OVERFLOW connections, so keep
+    # workers * (size + overflow) below the server's connection limit.
+    DB_POOL_SIZE = env_int('DB_POOL_SIZE', 5)
+    DB_MAX_OVERFLOW = env_int('DB_MAX_OVERFLOW', 5)
+    DB_POOL_TIMEOUT = env_int('DB_POOL_TIMEOUT', 30)  # seconds to wait for a free connection
+    DB_POOL_RECYCLE = env_int('DB_POOL_RECYCLE', 300)
+    DB_STATEMENT_TIMEOUT = env_int('DB_STATEMENT_TIMEOUT', 0)  # milliseconds, 0 for none
+    SQLITE_BUSY_TIMEOUT = env_int('SQLITE_BUSY_TIMEOUT', 5000)  # milliseconds
+
+    # Accept attendance photos as background jobs (attendance_jobs) instead
+    # of verifying them while the request waits
+    ATTENDANCE_ASYNC = os.environ.get('ATTENDANCE_ASYNC', 'False').lower() == 'true'
+    ATTENDANCE_JOB_WORKERS = env_int('ATTENDANCE_JOB_WORKERS', 2)  # threads per web worker
+
+    # Processes encoding photos for bulk imports (student_import); unset for one per CPU
+    STUDENT_IMPORT_WORKERS = env_int('STUDENT_IMPORT_WORKERS', None)
+
+    # Seconds a worker's encoding cache is used before it is reloaded, i.e.
+    # how long other workers may check attendance against a replaced face
+    ENCODING_CACHE_MAX_AGE = env_int('ENCODING_CACHE_MAX_AGE', 300)
+
+    # Approximate face index used by kiosk identification (built with `flask rebuild-face-index`)
+    FACE_INDEX_TYPE = os.environ.get('FACE_INDEX_TYPE', 'ivf')
+    FACE_INDEX_PATH = os.environ.get('FACE_INDEX_PATH')
+
+    # Content-addressed storage for profile images; rows only keep the key
+    BLOB_STORE_PATH = os.environ.get('BLOB_STORE_PATH')
+    THUMBNAIL_CACHE_PATH = os.environ.get('THUMBNAIL_CACHE_PATH')
+
+class DevelopmentConfig(Config):
+    """Local development: SQLite in the instance folder unless DATABASE_URL is set"""
+    SQLALCHEMY_DATABASE_URI = database_url('sqlite:///attendance.db')
+
+class ProductionConfig(Config):
+    """Deployment: PostgreSQL (or any server database) from DATABASE_URL"""
+    SQLALCHEMY_DATABASE_URI = database_url()
+
+    # Sized for the morning rush; fail a request after a few seconds
+    # without a connection rather than queueing it indefinitely
+    DB_POOL_SIZE = env_int('DB_POOL_SIZE', 10)
+    DB_MAX_OVERFLOW = env_int('DB_MAX_OVERFLOW', 10)
+    DB_POOL_TIMEOUT = env_int('DB_POOL_TIMEOUT', 5)
+    DB_STATEMENT_TIMEOUT = env_int('DB_STATEMENT_TIMEOUT', 15000)
+
+CONFIGS = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+}
+
+DEFAULT_CONFIG = os.environ.get('APP_CONFIG', 'development')
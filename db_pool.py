@@ -0,0 +1,148 @@
+import time
+import logging
+import threading
+from collections import deque
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+class PoolStats:
+    """Per-process connection checkout wait times and pool timeouts"""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self._count = 0
+        self._total = 0.0
+        self._longest = 0.0
+        self._timeouts = 0
+
+    def record(self, ms, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self._timeouts += 1
+                return
+            self._recent.append(ms)
+            self._count += 1
+            self._total += ms
+            self._longest = max(self._longest, ms)
+
+    def stats(self):
+        """Returns {checkouts, timeouts, mean_wait_ms, p95_wait_ms, max_wait_ms}"""
+        with self._lock:
+            recent = sorted(self._recent)
+            return {
+                'checkouts': self._count,
+                'timeouts': self._timeouts,
+                'mean_wait_ms': round(self._total / self._count, 3) if self._count else 0.0,
+                # Over the most recent checkouts only
+                'p95_wait_ms': round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 3) if recent else 0.0,
+                'max_wait_ms': round(self._longest, 3)
+            }
+
+# Shared checkout statistics for this worker process
+pool_stats = PoolStats()
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waits for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.record((time.perf_counter() - started) * 1000, timed_out=True)
+            raise
+        pool_stats.record((time.perf_counter() - started) * 1000)
+        return connection
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+def engine_options(config):
+    """
+    SQLAlchemy engine options from the DB_* settings of a config.
+
+    Server databases get a sized, timed QueuePool and a per-statement
+    timeout (DB_STATEMENT_TIMEOUT, milliseconds, 0 for none). In-memory
+    SQLite keeps SQLAlchemy's single-connection pool.
+
+    Args:
+        config: Flask config (or dict) with SQLALCHEMY_DATABASE_URI
+
+    Returns:
+        Dict for SQLALCHEMY_ENGINE_OPTIONS
+    """
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    options = {
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 300),
+    }
+    if _is_memory_sqlite(url):
+        return options
+
+    options.update({
+        'poolclass': TimedQueuePool,
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 5),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        # Reuse the most recently returned connection so idle ones can be recycled
+        'pool_use_lifo': True,
+    })
+
+    statement_timeout = config.get('DB_STATEMENT_TIMEOUT', 0)
+    backend = url.get_backend_name()
+    if statement_timeout and backend == 'postgresql':
+        options['connect_args'] = {'options': f'-c statement_timeout={int(statement_timeout)}'}
+    elif statement_timeout and backend in ('mysql', 'mariadb'):
+        options['connect_args'] = {'init_command': f'SET SESSION max_execution_time={int(statement_timeout)}'}
+    return options
+
+def configure_engine(engine, config):
+    """
+    Per-connection setup that engine options cannot express.
+
+    SQLite connections switch to WAL (readers no longer block the writer)
+    and wait SQLITE_BUSY_TIMEOUT milliseconds for a lock instead of failing
+    with "database is locked".
+    """
+    if engine.dialect.name != 'sqlite' or _is_memory_sqlite(engine.url):
+        return
+
+    busy_timeout = int(config.get('SQLITE_BUSY_TIMEOUT', 5000))
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA busy_timeout={busy_timeout}')
+        # Safe with WAL: a crash can lose the last commits but not corrupt the file
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.close()
+
+def pool_status(engine):
+    """
+    Current pool utilisation plus the checkout statistics of this process.
+
+    Returns:
+        Dict with size, checked_out, overflow, max_overflow, utilisation
+        (checked out / most connections the pool may open) and the
+        pool_stats fields
+    """
+    pool = engine.pool
+    status = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        status.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow,
+            'utilisation': round(pool.checkedout() / capacity, 3) if capacity > 0 else None
+        })
+    status.update(pool_stats.stats())
+    return status
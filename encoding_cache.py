@@ -0,0 +1,307 @@
+import logging
+import threading
+import time
+import numpy as np
+
+from face_index import load_index
+from face_utils import DEFAULT_ENCODER, encoding_encoder_name, find_best_match, find_best_matches, unpack_encoding
+from models import db, Student
+
+logger = logging.getLogger(__name__)
+
+class EncodingCache:
+    """
+    Process-level cache of enrolled face encodings.
+
+    Every student's encoding is stored as one row of a contiguous float32
+    matrix, with a dict mapping student IDs to row numbers. Only encodings
+    produced by ``encoder`` (the active encoder) are cached; students still
+    waiting to be re-encoded are read from the database. The cache is
+    filled lazily from the database on first use (or explicitly with
+    ``load``).
+
+    Each worker process owns its own copy. The routes that write students
+    update the copy of the process they run in; other processes (other
+    gunicorn workers, or the database changed by `flask reencode-faces`)
+    only see the change once their copy is older than ``max_age`` seconds,
+    when lookups and identification reload it. A lookup for an ID that is
+    not cached falls back to the database, so students enrolled through
+    another worker are picked up on first use.
+
+    If a saved approximate index exists at ``index_path`` it is loaded with
+    the cache, brought in sync with the cached encodings and used to pick
+    ``rerank_candidates`` candidates for identification, which are then
+    re-ranked exactly against the cached rows.
+    """
+
+    def __init__(self, initial_capacity=64, max_age=300, index_path=None, rerank_candidates=10,
+                 encoder=DEFAULT_ENCODER):
+        self._lock = threading.RLock()
+        self.encoder = encoder
+        self._initial_capacity = initial_capacity
+        self.max_age = max_age
+        self.index_path = index_path
+        self.rerank_candidates = rerank_candidates
+        self.index = None
+        self._reset()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.invalidations = 0
+
+    def _reset(self):
+        self._matrix = None
+        self._squared_norms = None
+        self._ids = []
+        self._rows = {}
+        self._loaded = False
+        self._loaded_at = None
+
+    def _ensure_capacity(self, dim):
+        """Allocate or grow the matrix so one more row fits"""
+        if self._matrix is None:
+            self._matrix = np.empty((self._initial_capacity, dim), dtype=np.float32)
+            self._squared_norms = np.empty(self._initial_capacity, dtype=np.float32)
+        elif len(self._ids) == self._matrix.shape[0]:
+            size = len(self._ids)
+            grown = np.empty((size * 2, dim), dtype=np.float32)
+            grown[:size] = self._matrix[:size]
+            self._matrix = grown
+            grown_norms = np.empty(size * 2, dtype=np.float32)
+            grown_norms[:size] = self._squared_norms[:size]
+            self._squared_norms = grown_norms
+
+    def _put(self, student_id, encoding):
+        encoding = np.asarray(encoding, dtype=np.float32).ravel()
+
+        if self._matrix is not None and encoding.shape[0] != self._matrix.shape[1]:
+            logger.warning(f"Encoding for student {student_id} has {encoding.shape[0]} dimensions, "
+                           f"cache holds {self._matrix.shape[1]}; not caching it")
+            self._remove(student_id)
+            return
+
+        row = self._rows.get(student_id)
+        if row is None:
+            self._ensure_capacity(encoding.shape[0])
+            row = len(self._ids)
+            self._ids.append(student_id)
+            self._rows[student_id] = row
+
+        self._matrix[row] = encoding
+        self._squared_norms[row] = encoding @ encoding
+
+        if self.index is not None:
+            self.index.add(student_id, encoding)
+
+    def _remove(self, student_id):
+        if self.index is not None:
+            self.index.remove(student_id)
+
+        row = self._rows.pop(student_id, None)
+        if row is None:
+            return
+
+        # Move the last row into the freed slot to keep the matrix contiguous
+        last = len(self._ids) - 1
+        if row != last:
+            moved_id = self._ids[last]
+            self._matrix[row] = self._matrix[last]
+            self._squared_norms[row] = self._squared_norms[last]
+            self._ids[row] = moved_id
+            self._rows[moved_id] = row
+        self._ids.pop()
+
+    def _load_index(self):
+        """Load the saved approximate index and reconcile it with the cached rows"""
+        self.index = None
+        if not self.index_path:
+            return
+
+        try:
+            index = load_index(self.index_path)
+        except Exception as e:
+            logger.error(f"Error loading face index from {self.index_path}: {str(e)}")
+            return
+        if index is None:
+            return
+
+        if self._matrix is not None and index.dimensions != self._matrix.shape[1]:
+            logger.warning(f"Face index has {index.dimensions} dimensions, cache holds "
+                           f"{self._matrix.shape[1]}; ignoring it until it is rebuilt")
+            return
+
+        # Students approved or deleted since the index was last rebuilt
+        indexed_ids = set(index.ids())
+        for student_id in indexed_ids - self._rows.keys():
+            index.remove(student_id)
+        for student_id in self._rows.keys() - indexed_ids:
+            index.add(student_id, self._matrix[self._rows[student_id]])
+
+        self.index = index
+
+    def load(self):
+        """Fill the cache with every enrolled student's encoding from the database"""
+        with self._lock:
+            self.index = None
+            self._reset()
+
+            rows = db.session.query(Student.id, Student.face_encoding).filter(
+                Student.face_encoding.isnot(None)
+            ).all()
+
+            skipped = 0
+            for student_id, face_encoding in rows:
+                try:
+                    if encoding_encoder_name(face_encoding) != self.encoder:
+                        skipped += 1
+                        continue
+                    self._put(student_id, unpack_encoding(face_encoding))
+                except Exception as e:
+                    logger.error(f"Error loading face encoding for student {student_id}: {str(e)}")
+
+            self._load_index()
+
+            self._loaded = True
+            self._loaded_at = time.monotonic()
+            self.loads += 1
+            logger.info(f"Encoding cache loaded {len(self._ids)} {self.encoder} encodings, "
+                        f"skipped {skipped} from other encoders")
+
+    def _load_if_stale(self):
+        """Reloads the cache if it was never loaded or is older than ``max_age``; call with the lock held"""
+        if not self._loaded or time.monotonic() - self._loaded_at > self.max_age:
+            self.load()
+
+    def get(self, student_id):
+        """
+        Returns the stored encoding for a student and the encoder that
+        produced it, reading it from the database on a miss. Like
+        identification, reloads the cache once it is older than ``max_age``.
+
+        Args:
+            student_id: Student ID
+
+        Returns:
+            (encoding, encoder name), or (None, None) if the student has no
+            stored encoding. Cached encodings are float32 copies of the row.
+        """
+        with self._lock:
+            self._load_if_stale()
+
+            row = self._rows.get(student_id)
+            if row is not None:
+                self.hits += 1
+                return self._matrix[row].copy(), self.encoder
+
+            self.misses += 1
+
+        face_encoding = db.session.query(Student.face_encoding).filter(
+            Student.id == student_id
+        ).scalar()
+        if face_encoding is None:
+            return None, None
+
+        encoder_name = encoding_encoder_name(face_encoding)
+        encoding = unpack_encoding(face_encoding)
+        if encoder_name == self.encoder:
+            self.put(student_id, encoding)
+        return np.asarray(encoding, dtype=np.float32), encoder_name
+
+    def identify(self, encoding):
+        """
+        Finds the enrolled student whose encoding is closest to ``encoding``.
+
+        Args:
+            encoding: Probe face encoding
+
+        Returns:
+            (student_id, distance), or (None, None) if nobody is enrolled
+        """
+        with self._lock:
+            self._load_if_stale()
+
+            size = len(self._ids)
+            if size == 0:
+                return None, None
+
+            self.hits += 1
+
+            if self.index is not None and len(self.index) > 0:
+                # Re-rank the approximate candidates on the full encodings
+                candidates = self.index.search(encoding, k=self.rerank_candidates)
+                rows = [self._rows[student_id] for student_id, _ in candidates
+                        if student_id in self._rows]
+                if rows:
+                    index, distance = find_best_match(self._matrix[rows], encoding,
+                                                      self._squared_norms[rows])
+                    return self._ids[rows[index]], distance
+
+            index, distance = find_best_match(self._matrix[:size], encoding,
+                                              self._squared_norms[:size])
+            return self._ids[index], distance
+
+    def identify_many(self, encodings):
+        """
+        ``identify`` for many probes, compared exactly against the whole
+        cache in blocks of matrix products.
+
+        Args:
+            encodings: (M, D) matrix of probe encodings from ``encoder``
+
+        Returns:
+            List of M (student_id, distance) pairs, all (None, None) if
+            nobody is enrolled
+        """
+        with self._lock:
+            self._load_if_stale()
+
+            size = len(self._ids)
+            if size == 0:
+                return [(None, None)] * len(encodings)
+
+            self.hits += len(encodings)
+            indices, distances = find_best_matches(self._matrix[:size], encodings,
+                                                   self._squared_norms[:size])
+            return [(self._ids[index], float(distance)) for index, distance in zip(indices, distances)]
+
+    def put(self, student_id, encoding, encoder=None):
+        """Add or replace the encoding for a student"""
+        if encoding is None or (encoder or DEFAULT_ENCODER) != self.encoder:
+            self.remove(student_id)
+            return
+
+        with self._lock:
+            if self._loaded:
+                self._put(student_id, encoding)
+
+    def remove(self, student_id):
+        """Drop a student's encoding from the cache"""
+        with self._lock:
+            self._remove(student_id)
+
+    def invalidate(self):
+        """Discard everything; the next lookup reloads from the database"""
+        with self._lock:
+            self._reset()
+            self.invalidations += 1
+
+    def stats(self):
+        """Returns hit/miss counters and the current cache size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._ids),
+                'dimensions': self._matrix.shape[1] if self._matrix is not None else 0,
+                'encoder': self.encoder,
+                'loaded': self._loaded,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+                'loads': self.loads,
+                'invalidations': self.invalidations,
+                'index': self.index.kind if self.index is not None else None,
+                'index_size': len(self.index) if self.index is not None else 0
+            }
+
+# Shared cache for this worker process
+encoding_cache = EncodingCache()
@@ -0,0 +1,437 @@
+import os
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Index file format version (bumped when the saved arrays change)
+INDEX_FORMAT_VERSION = 1
+
+def _squared_distances(vectors, probe, squared_norms=None):
+    """Squared Euclidean distances from every row of ``vectors`` to ``probe``"""
+    if squared_norms is None:
+        squared_norms = np.einsum('ij,ij->i', vectors, vectors)
+    return squared_norms - 2.0 * (vectors @ probe) + probe @ probe
+
+def _top_k(ids, squared_distances, k):
+    """Returns the k closest (id, distance) pairs sorted by distance"""
+    k = min(k, len(ids))
+    if k == 0:
+        return []
+
+    nearest = np.argpartition(squared_distances, k - 1)[:k]
+    nearest = nearest[np.argsort(squared_distances[nearest])]
+
+    return [(ids[i], float(np.sqrt(max(squared_distances[i], 0.0)))) for i in nearest]
+
+class PCAProjector:
+    """
+    Linear dimensionality reduction fitted with randomized SVD.
+
+    Only a (D, d) projection matrix and the mean are kept, so projecting a
+    10,000-dimensional encoding costs one small matrix-vector product.
+    """
+
+    def __init__(self, mean=None, components=None):
+        self.mean = mean
+        self.components = components
+
+    @property
+    def n_components(self):
+        return self.components.shape[1] if self.components is not None else 0
+
+    def fit(self, vectors, n_components, n_iter=2, seed=0):
+        """
+        Fits the projection on a sample of encodings.
+
+        Args:
+            vectors: (N, D) training matrix
+            n_components: Target dimensionality
+            n_iter: Power iterations (more is slower but more accurate)
+            seed: Random seed for the sketch matrix
+
+        Returns:
+            self
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n_components = min(n_components, vectors.shape[0], vectors.shape[1])
+
+        self.mean = vectors.mean(axis=0)
+        centered = vectors - self.mean
+
+        # Randomized range finder (Halko et al.) on the centered data
+        rng = np.random.default_rng(seed)
+        sketch_size = min(n_components + 10, min(centered.shape))
+        sketch = centered @ rng.standard_normal((centered.shape[1], sketch_size)).astype(np.float32)
+        for _ in range(n_iter):
+            sketch, _ = np.linalg.qr(sketch)
+            sketch = centered @ (centered.T @ sketch)
+        basis, _ = np.linalg.qr(sketch)
+
+        _, _, vt = np.linalg.svd(basis.T @ centered, full_matrices=False)
+        self.components = np.ascontiguousarray(vt[:n_components].T, dtype=np.float32)
+
+        return self
+
+    def transform(self, vectors):
+        """Projects (N, D) or (D,) encodings into the reduced space"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return (vectors - self.mean) @ self.components
+
+class FaceIndex:
+    """
+    Base class for nearest-neighbour indexes over face encodings.
+
+    Subclasses keep a mapping from student IDs to vectors and implement
+    ``add``, ``remove`` and ``search``. Indexes are saved to and loaded from
+    a single ``.npz`` file.
+    """
+
+    kind = None
+
+    def __len__(self):
+        raise NotImplementedError
+
+    @property
+    def dimensions(self):
+        raise NotImplementedError
+
+    def ids(self):
+        raise NotImplementedError
+
+    def build(self, ids, vectors):
+        raise NotImplementedError
+
+    def add(self, student_id, vector):
+        raise NotImplementedError
+
+    def remove(self, student_id):
+        raise NotImplementedError
+
+    def search(self, vector, k=1):
+        """Returns up to k (student_id, distance) pairs, closest first"""
+        raise NotImplementedError
+
+    def _state(self):
+        raise NotImplementedError
+
+    @classmethod
+    def _from_state(cls, state):
+        raise NotImplementedError
+
+    def save(self, path):
+        """Writes the index atomically to ``path``"""
+        state = self._state()
+        state['kind'] = np.array(self.kind)
+        state['format_version'] = np.array(INDEX_FORMAT_VERSION)
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **state)
+        os.replace(tmp_path, path)
+
+class ExactIndex(FaceIndex):
+    """Brute-force search over the full encodings (the recall baseline)"""
+
+    kind = 'exact'
+
+    def __init__(self):
+        self._ids = []
+        self._rows = {}
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._squared_norms = np.empty(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def dimensions(self):
+        return self._vectors.shape[1]
+
+    def ids(self):
+        return list(self._ids)
+
+    def build(self, ids, vectors):
+        self._ids = list(ids)
+        self._rows = {student_id: row for row, student_id in enumerate(self._ids)}
+        self._vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self._squared_norms = np.einsum('ij,ij->i', self._vectors, self._vectors)
+        return self
+
+    def add(self, student_id, vector):
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        if student_id in self._rows:
+            self._vectors[self._rows[student_id]] = vector
+            self._squared_norms[self._rows[student_id]] = vector @ vector
+            return
+
+        if len(self._ids) == 0:
+            self._vectors = vector[np.newaxis, :].copy()
+        else:
+            self._vectors = np.vstack([self._vectors, vector])
+        self._squared_norms = np.append(self._squared_norms, vector @ vector)
+        self._rows[student_id] = len(self._ids)
+        self._ids.append(student_id)
+
+    def remove(self, student_id):
+        row = self._rows.pop(student_id, None)
+        if row is None:
+            return
+
+        last = len(self._ids) - 1
+        if row != last:
+            self._vectors[row] = self._vectors[last]
+            self._squared_norms[row] = self._squared_norms[last]
+            self._ids[row] = self._ids[last]
+            self._rows[self._ids[row]] = row
+        self._ids.pop()
+        self._vectors = self._vectors[:last]
+        self._squared_norms = self._squared_norms[:last]
+
+    def search(self, vector, k=1):
+        if not self._ids:
+            return []
+        probe = np.asarray(vector, dtype=np.float32).ravel()
+        return _top_k(self._ids, _squared_distances(self._vectors, probe, self._squared_norms), k)
+
+    def _state(self):
+        return {'ids': np.array(self._ids, dtype=str), 'vectors': self._vectors}
+
+    @classmethod
+    def _from_state(cls, state):
+        return cls().build(state['ids'].tolist(), state['vectors'])
+
+class IVFIndex(FaceIndex):
+    """
+    Inverted-file index in a PCA-reduced space.
+
+    Encodings are projected to ``n_components`` dimensions and assigned to
+    the nearest of ``n_lists`` k-means centroids. A search only scans the
+    ``n_probe`` lists whose centroids are closest to the probe, so the cost
+    grows with N / n_lists instead of N.
+    """
+
+    kind = 'ivf'
+
+    def __init__(self, n_components=128, n_lists=None, n_probe=8, kmeans_iterations=15,
+                 train_size=20000, seed=0):
+        self.n_components = n_components
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.kmeans_iterations = kmeans_iterations
+        self.train_size = train_size
+        self.seed = seed
+
+        self.projector = PCAProjector()
+        self.centroids = None
+        self._list_ids = []
+        self._list_vectors = []
+        self._locations = {}
+        self._dimensions = 0
+
+    def __len__(self):
+        return len(self._locations)
+
+    @property
+    def dimensions(self):
+        return self._dimensions
+
+    def ids(self):
+        return list(self._locations)
+
+    def _fit_centroids(self, reduced, n_lists, rng):
+        """Plain Lloyd's k-means on the reduced training vectors"""
+        centroids = reduced[rng.choice(reduced.shape[0], n_lists, replace=False)].copy()
+
+        for _ in range(self.kmeans_iterations):
+            assignments = self._assign(reduced, centroids)
+
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, reduced)
+            counts = np.bincount(assignments, minlength=n_lists)
+
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, np.newaxis]
+
+            # Re-seed empty lists with random training vectors
+            empty = np.flatnonzero(~filled)
+            if len(empty):
+                centroids[empty] = reduced[rng.integers(reduced.shape[0], size=len(empty))]
+
+        return centroids
+
+    @staticmethod
+    def _assign(reduced, centroids):
+        """Index of the nearest centroid for every row of ``reduced``"""
+        centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+        return np.argmin(centroid_norms[np.newaxis, :] - 2.0 * (reduced @ centroids.T), axis=1)
+
+    def build(self, ids, vectors):
+        """
+        Trains PCA and the coarse quantizer on ``vectors`` and indexes them.
+
+        Args:
+            ids: Student IDs, one per row
+            vectors: (N, D) matrix of encodings
+
+        Returns:
+            self
+        """
+        ids = list(ids)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        rng = np.random.default_rng(self.seed)
+
+        if len(ids) == 0:
+            raise ValueError("Cannot build an IVF index without any encodings")
+
+        train = vectors
+        if vectors.shape[0] > self.train_size:
+            train = vectors[rng.choice(vectors.shape[0], self.train_size, replace=False)]
+
+        self._dimensions = vectors.shape[1]
+        self.projector.fit(train, self.n_components, seed=self.seed)
+
+        n_lists = self.n_lists or max(1, int(np.sqrt(len(ids))))
+        n_lists = min(n_lists, train.shape[0])
+        self.centroids = self._fit_centroids(self.projector.transform(train), n_lists, rng)
+
+        reduced = self.projector.transform(vectors)
+        assignments = self._assign(reduced, self.centroids)
+
+        self._list_ids = [[] for _ in range(n_lists)]
+        self._list_vectors = []
+        self._locations = {}
+        for c in range(n_lists):
+            members = np.flatnonzero(assignments == c)
+            self._list_ids[c] = [ids[i] for i in members]
+            self._list_vectors.append(np.ascontiguousarray(reduced[members]))
+            for position, i in enumerate(members):
+                self._locations[ids[i]] = (c, position)
+
+        return self
+
+    def add(self, student_id, vector):
+        if self.centroids is None:
+            raise ValueError("IVF index must be built before adding encodings")
+
+        self.remove(student_id)
+
+        reduced = self.projector.transform(np.asarray(vector, dtype=np.float32).ravel())
+        c = int(self._assign(reduced[np.newaxis, :], self.centroids)[0])
+
+        self._locations[student_id] = (c, len(self._list_ids[c]))
+        self._list_ids[c].append(student_id)
+        self._list_vectors[c] = np.vstack([self._list_vectors[c], reduced])
+
+    def remove(self, student_id):
+        location = self._locations.pop(student_id, None)
+        if location is None:
+            return
+
+        c, position = location
+        list_ids = self._list_ids[c]
+        last = len(list_ids) - 1
+        if position != last:
+            self._list_vectors[c][position] = self._list_vectors[c][last]
+            list_ids[position] = list_ids[last]
+            self._locations[list_ids[position]] = (c, position)
+        list_ids.pop()
+        self._list_vectors[c] = self._list_vectors[c][:last]
+
+    def search(self, vector, k=1, n_probe=None):
+        if not self._locations:
+            return []
+
+        n_probe = min(n_probe or self.n_probe, len(self._list_ids))
+        probe = self.projector.transform(np.asarray(vector, dtype=np.float32).ravel())
+
+        centroid_distances = _squared_distances(self.centroids, probe)
+        lists = np.argpartition(centroid_distances, n_probe - 1)[:n_probe]
+
+        candidate_ids = []
+        for c in lists:
+            candidate_ids.extend(self._list_ids[c])
+        if not candidate_ids:
+            return []
+        candidates = np.concatenate([self._list_vectors[c] for c in lists])
+
+        return _top_k(candidate_ids, _squared_distances(candidates, probe), k)
+
+    def _state(self):
+        ids = []
+        labels = []
+        for c, list_ids in enumerate(self._list_ids):
+            ids.extend(list_ids)
+            labels.extend([c] * len(list_ids))
+
+        return {
+            'ids': np.array(ids, dtype=str),
+            'labels': np.array(labels, dtype=np.int32),
+            'vectors': np.concatenate(self._list_vectors) if self._list_vectors else np.empty((0, 0)),
+            'centroids': self.centroids,
+            'mean': self.projector.mean,
+            'components': self.projector.components,
+            'params': np.array([self.n_probe, self._dimensions], dtype=np.int64)
+        }
+
+    @classmethod
+    def _from_state(cls, state):
+        n_probe, dimensions = (int(v) for v in state['params'])
+        centroids = state['centroids']
+        components = state['components']
+
+        index = cls(n_components=components.shape[1], n_lists=centroids.shape[0], n_probe=n_probe)
+        index.projector = PCAProjector(state['mean'], components)
+        index.centroids = centroids
+        index._dimensions = dimensions
+
+        ids = state['ids'].tolist()
+        labels = state['labels']
+        vectors = state['vectors']
+        index._list_ids = [[] for _ in range(centroids.shape[0])]
+        index._list_vectors = []
+        for c in range(centroids.shape[0]):
+            members = np.flatnonzero(labels == c)
+            index._list_ids[c] = [ids[i] for i in members]
+            index._list_vectors.append(np.ascontiguousarray(vectors[members], dtype=np.float32))
+            for position, i in enumerate(members):
+                index._locations[ids[i]] = (c, position)
+
+        return index
+
+# Available index implementations, keyed by FACE_INDEX_TYPE name
+INDEX_TYPES = {
+    ExactIndex.kind: ExactIndex,
+    IVFIndex.kind: IVFIndex,
+}
+
+def create_index(kind, **params):
+    """Creates an empty index of the given kind ('exact' or 'ivf')"""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown face index type: {kind}")
+    return INDEX_TYPES[kind](**params)
+
+def load_index(path):
+    """
+    Loads an index saved with ``FaceIndex.save``.
+
+    Returns:
+        FaceIndex, or None if ``path`` does not exist
+    """
+    if not os.path.exists(path):
+        return None
+
+    with np.load(path, allow_pickle=False) as data:
+        state = {name: data[name] for name in data.files}
+
+    version = int(state['format_version'])
+    if version != INDEX_FORMAT_VERSION:
+        raise ValueError(f"Unsupported face index format version: {version}")
+
+    kind = str(state['kind'])
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown face index type: {kind}")
+
+    index = INDEX_TYPES[kind]._from_state(state)
+    logger.info(f"Loaded {kind} face index with {len(index)} encodings from {path}")
+    return index
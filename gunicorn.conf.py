@@ -0,0 +1,18 @@
+# Gunicorn settings; picked up automatically when gunicorn starts in this directory
+import os
+
+# Import the app once in the master and fork the workers from it, so a new
+# worker is ready as soon as it is forked. Set GUNICORN_PRELOAD=false to
+# have every worker import the app itself (e.g. for --reload).
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() == 'true'
+
+def when_ready(server):
+    """With preload, load the face detectors in the master so workers share them copy-on-write"""
+    if preload_app:
+        from face_utils import warm_up
+        warm_up()
+
+def post_worker_init(worker):
+    """Load the face detectors before the worker accepts requests (reuses any inherited from the master)"""
+    from face_utils import warm_up
+    warm_up()
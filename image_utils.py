@@ -0,0 +1,248 @@
+import io
+import base64
+import binascii
+import importlib
+import logging
+import threading
+import time
+import numpy as np
+from contextlib import contextmanager
+from flask import request
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+class LazyModule:
+    """
+    Stands in for a module that is imported on first attribute access.
+
+    Importing cv2 costs more than the rest of the app's imports besides
+    Flask and SQLAlchemy, and most requests never touch it, so modules use
+    ``cv2 = LazyModule('cv2')`` instead of ``import cv2``.
+    """
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        # After the first call this is a sys.modules lookup
+        return getattr(importlib.import_module(self._name), attr)
+
+cv2 = LazyModule('cv2')
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# PNG colour types that can carry transparency: palette (tRNS), grey + alpha, RGBA
+_PNG_ALPHA_COLOR_TYPES = (3, 4, 6)
+
+class StageTimer:
+    """
+    Collects wall-clock timings (in milliseconds) for the stages of one
+    image-processing request, e.g. read, decode, detect and encode.
+
+    Use ``stage`` as a context manager around each step, then ``record`` to
+    add the timings to ``pipeline_stats`` once the request is done.
+    """
+
+    def __init__(self, pipeline='face_ingest'):
+        self.pipeline = pipeline
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+
+    @property
+    def total(self):
+        return sum(self.timings.values())
+
+    def record(self, stats=None):
+        """Adds these timings to the aggregate stats and logs them"""
+        (stats or pipeline_stats).record(self.pipeline, self.timings)
+        logger.debug(f"{self.pipeline} timings: " +
+                     ', '.join(f"{name} {ms:.1f}ms" for name, ms in self.timings.items()) +
+                     f", total {self.total:.1f}ms")
+
+class PipelineStats:
+    """Per-process count, mean and max duration of every recorded stage"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def record(self, pipeline, timings):
+        with self._lock:
+            stages = self._stages.setdefault(pipeline, {})
+            for name, ms in timings.items():
+                count, total, longest = stages.get(name, (0, 0.0, 0.0))
+                stages[name] = (count + 1, total + ms, max(longest, ms))
+
+    def stats(self):
+        """Returns {pipeline: {stage: {count, mean_ms, max_ms}}}"""
+        with self._lock:
+            return {
+                pipeline: {
+                    name: {
+                        'count': count,
+                        'mean_ms': round(total / count, 3),
+                        'max_ms': round(longest, 3)
+                    }
+                    for name, (count, total, longest) in stages.items()
+                }
+                for pipeline, stages in self._stages.items()
+            }
+
+# Shared stage timings for this worker process
+pipeline_stats = PipelineStats()
+
+def decode_base64_image(data):
+    """
+    Decodes a base64 image string, with or without a data URL prefix.
+
+    Returns:
+        image bytes
+
+    Raises:
+        ValueError: if the string is not valid base64
+    """
+    # Remove data URL prefix if present
+    if ',' in data:
+        data = data.split(',', 1)[1]
+    try:
+        return base64.b64decode(data)
+    except binascii.Error as e:
+        raise ValueError(f"Invalid base64 image data: {str(e)}")
+
+def _has_alpha(image_bytes):
+    """Whether the encoded image may carry transparency (PNG or WebP)"""
+    if image_bytes[:8] == _PNG_SIGNATURE:
+        # The colour type follows the IHDR width, height and bit depth
+        return len(image_bytes) > 25 and image_bytes[25] in _PNG_ALPHA_COLOR_TYPES
+    if image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+        chunk = image_bytes[12:16]
+        return chunk == b'VP8L' or (chunk == b'VP8X' and len(image_bytes) > 20 and image_bytes[20] & 0x10)
+    return False
+
+def _flatten_alpha(image, grayscale):
+    """Composites an image decoded with IMREAD_UNCHANGED onto white"""
+    if image.dtype == np.uint16:
+        image = (image >> 8).astype(np.uint8)
+
+    if image.ndim == 3 and image.shape[2] == 4:
+        # Transparent backgrounds become white instead of black
+        alpha = image[:, :, 3:4].astype(np.float32) / 255.0
+        image = (image[:, :, :3] * alpha + 255.0 * (1.0 - alpha)).astype(np.uint8)
+
+    if grayscale and image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if not grayscale and image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    return image
+
+def _decode_with_pillow(image_bytes, grayscale):
+    """Fallback for formats OpenCV cannot read (e.g. GIF)"""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as pil_image:
+            pil_image = ImageOps.exif_transpose(pil_image)
+            if pil_image.mode in ('RGBA', 'LA', 'PA', 'P') or 'transparency' in pil_image.info:
+                rgba = pil_image.convert('RGBA')
+                pil_image = Image.new('RGBA', rgba.size, (255, 255, 255, 255))
+                pil_image.alpha_composite(rgba)
+
+            if grayscale:
+                return np.asarray(pil_image.convert('L'))
+            return cv2.cvtColor(np.asarray(pil_image.convert('RGB')), cv2.COLOR_RGB2BGR)
+    except Exception as e:
+        logger.warning(f"Could not decode image: {str(e)}")
+        return None
+
+def decode_image(image_bytes, grayscale=True):
+    """
+    Decodes image bytes into a NumPy array for OpenCV.
+
+    Face detection and encoding only need grayscale, so by default the image
+    is decoded straight to a single channel. EXIF orientation is applied and
+    transparent (RGBA/palette) images are composited onto white.
+
+    Args:
+        image_bytes: Encoded image (JPEG, PNG, WebP, ...)
+        grayscale: Decode to grayscale instead of BGR
+
+    Returns:
+        uint8 numpy array, or None if the bytes are not a decodable image
+    """
+    if not image_bytes:
+        return None
+
+    # Decode straight from the buffer, no intermediate copies
+    buffer = np.frombuffer(memoryview(image_bytes), dtype=np.uint8)
+    if _has_alpha(image_bytes):
+        image = cv2.imdecode(buffer, cv2.IMREAD_UNCHANGED)
+        if image is not None:
+            image = _flatten_alpha(image, grayscale)
+    else:
+        # IMREAD_GRAYSCALE and IMREAD_COLOR both apply the EXIF orientation
+        image = cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR)
+
+    if image is None:
+        image = _decode_with_pillow(image_bytes, grayscale)
+    return image
+
+def read_image_bytes():
+    """
+    Reads the captured face image bytes from the current request.
+
+    Accepts, in order of preference: a JPEG uploaded as the multipart file
+    field ``face_image_file``, a raw ``image/*`` request body, or the legacy
+    base64 data URL in the ``face_image`` form field.
+
+    Returns:
+        image bytes, or None if no image was sent
+
+    Raises:
+        ValueError: if the base64 form field is malformed
+    """
+    upload = request.files.get('face_image_file')
+    if upload and upload.filename:
+        image_bytes = upload.read()
+    elif request.mimetype.startswith('image/'):
+        image_bytes = request.get_data(cache=False)
+    else:
+        face_image_data = request.form.get('face_image')
+        if not face_image_data:
+            return None
+        image_bytes = decode_base64_image(face_image_data)
+
+    return image_bytes or None
+
+def read_face_image(grayscale=True, timer=None):
+    """
+    Reads and decodes the captured face image from the current request.
+
+    Args:
+        grayscale: Decode to grayscale (all face detection needs)
+        timer: Optional StageTimer for the 'read' and 'decode' stages
+
+    Returns:
+        (image, image_bytes): (None, None) if no image was sent, and
+        (None, image_bytes) if the data could not be decoded as an image
+    """
+    timer = timer or StageTimer()
+
+    with timer.stage('read'):
+        try:
+            image_bytes = read_image_bytes()
+        except ValueError as e:
+            logger.warning(str(e))
+            return None, b''
+
+    if image_bytes is None:
+        return None, None
+
+    with timer.stage('decode'):
+        image = decode_image(image_bytes, grayscale=grayscale)
+    return image, image_bytes
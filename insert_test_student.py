@@ -1,9 +1,10 @@
 import os
 from dotenv import load_dotenv
 import psycopg2
-import json
 from werkzeug.security import generate_password_hash
 
+from face_utils import pack_encoding
+
 # Load environment variables
 load_dotenv()
 
@@ -26,7 +27,7 @@ def insert_test_student():
         class_name = "Test Class"
         
         # Simple face encoding (just a placeholder)
-        face_encoding = json.dumps([0.1, 0.2, 0.3, 0.4, 0.5])
+        face_encoding = psycopg2.Binary(pack_encoding([0.1, 0.2, 0.3, 0.4, 0.5]))
         
         # Check if student already exists
         cursor.execute("SELECT COUNT(*) FROM students WHERE id = %s", (student_id,))
@@ -1,13 +1,16 @@
-import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Set environment variable to prevent database reset
-os.environ['PRESERVE_DB'] = 'True'
+from app import create_app
 
-from app import app
+app = create_app()
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    # The development server applies pending migrations itself; deployments
+    # run `flask --app main upgrade` once before starting the workers
+    from migrations import upgrade
+    with app.app_context():
+        upgrade()
+    app.run(debug=True)
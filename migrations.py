@@ -0,0 +1,282 @@
+import logging
+from datetime import datetime
+from sqlalchemy import inspect, text, LargeBinary
+
+from attendance_summary import rebuild_daily_summary
+from blob_store import blob_store
+from face_utils import ENCODING_MAGIC, encoding_encoder_name, pack_encoding, unpack_encoding
+from image_utils import decode_base64_image
+from models import db, Admin, Attendance, AttendanceDailySummary, AttendanceJob, SchemaMigration, Student, StudentImportJob, StudentRegistrationRequest
+
+logger = logging.getLogger(__name__)
+
+# Ordered (version, description, function) of every schema migration
+MIGRATIONS = []
+
+BATCH_SIZE = 200
+
+def migration(version, description):
+    """
+    Registers a migration step.
+
+    Steps run in registration order, each in its own transaction, and are
+    recorded in schema_migrations. A step receives the session's connection
+    and returns an optional summary line. Steps check the schema before
+    changing it, so they also bring a database created by an older release
+    (which has no schema_migrations table) up to date.
+    """
+    def register(function):
+        MIGRATIONS.append((version, description, function))
+        return function
+    return register
+
+def _has_column(conn, table, column):
+    return column in {c['name'] for c in inspect(conn).get_columns(table)}
+
+def _batches(conn, table, key, column, where=None):
+    """Yields (key, value) row batches of ``column``, paging on ``key``"""
+    last_key = None
+    while True:
+        # Keyset pagination keeps only one batch in memory
+        conditions = [where] if where else []
+        params = {'limit': BATCH_SIZE}
+        if last_key is not None:
+            conditions.append(f"{key} > :last_key")
+            params['last_key'] = last_key
+        query = f"SELECT {key}, {column} FROM {table}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY {key} LIMIT :limit"
+
+        rows = conn.execute(text(query), params).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_key = rows[-1][0]
+
+@migration('0001', 'Create the base tables')
+def create_base_tables(conn):
+    tables = [Admin.__table__, Student.__table__, StudentRegistrationRequest.__table__, Attendance.__table__]
+    missing = [table.name for table in tables if not inspect(conn).has_table(table.name)]
+    db.metadata.create_all(conn, tables=tables)
+    return f"created {', '.join(missing)}" if missing else None
+
+@migration('0002', 'Add the attendance status column')
+def add_attendance_status(conn):
+    if _has_column(conn, 'attendances', 'status'):
+        return None
+    conn.execute(text("ALTER TABLE attendances ADD COLUMN status VARCHAR(20) NOT NULL DEFAULT 'present'"))
+    return 'added attendances.status'
+
+# Tables holding a face_encoding or profile image, with their primary key column
+PROFILE_TABLES = [
+    ('students', 'id'),
+    ('student_registration_requests', 'id'),
+]
+
+def _binary_type_name(dialect_name):
+    """Name of the binary column type for the current database"""
+    if dialect_name == 'postgresql':
+        return 'BYTEA'
+    return 'BLOB'
+
+def _convert_encodings(conn, table, key, source_column, target_column):
+    """Re-encode every JSON face encoding in ``source_column`` into ``target_column``"""
+    converted = 0
+    for rows in _batches(conn, table, key, source_column):
+        updates = []
+        for row_key, value in rows:
+            if value is None:
+                continue
+            if isinstance(value, (bytes, memoryview)) and bytes(value[:4]) == ENCODING_MAGIC:
+                if source_column == target_column:
+                    continue  # Already in the binary format
+                packed = bytes(value)
+            else:
+                packed = pack_encoding(unpack_encoding(value), encoder=encoding_encoder_name(value))
+            updates.append({'key': row_key, 'encoding': packed})
+
+        if updates:
+            conn.execute(
+                text(f"UPDATE {table} SET {target_column} = :encoding WHERE {key} = :key"),
+                updates
+            )
+            converted += len(updates)
+    return converted
+
+@migration('0003', 'Store face encodings in the packed binary format')
+def binary_face_encodings(conn):
+    summary = []
+    for table, key in PROFILE_TABLES:
+        columns = {column['name']: column for column in inspect(conn).get_columns(table)}
+        if 'face_encoding' not in columns:
+            continue
+
+        if isinstance(columns['face_encoding']['type'], LargeBinary):
+            # Column already binary; repack any leftover JSON values in place
+            converted = _convert_encodings(conn, table, key, 'face_encoding', 'face_encoding')
+            if converted:
+                summary.append(f"{table}: repacked {converted} rows")
+            continue
+
+        # Convert into a new binary column, then swap it in for the old text column
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN face_encoding_bin {_binary_type_name(conn.dialect.name)}"))
+        converted = _convert_encodings(conn, table, key, 'face_encoding', 'face_encoding_bin')
+        conn.execute(text(f"ALTER TABLE {table} DROP COLUMN face_encoding"))
+        conn.execute(text(f"ALTER TABLE {table} RENAME COLUMN face_encoding_bin TO face_encoding"))
+        summary.append(f"{table}: converted {converted} rows")
+    return '; '.join(summary) or None
+
+@migration('0004', 'Move profile images into the blob store')
+def profile_images_to_blob_store(conn):
+    summary = []
+    for table, key in PROFILE_TABLES:
+        if not _has_column(conn, table, 'profile_image_key'):
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN profile_image_key VARCHAR(64)"))
+        if not _has_column(conn, table, 'profile_image'):
+            continue
+
+        moved = 0
+        for rows in _batches(conn, table, key, 'profile_image', where='profile_image IS NOT NULL'):
+            updates = []
+            for row_key, value in rows:
+                try:
+                    image_bytes = decode_base64_image(value)
+                except ValueError as e:
+                    # Stop before dropping the column, so the image is not lost
+                    raise ValueError(f"{table} {row_key}: undecodable profile image ({str(e)})")
+                if image_bytes:
+                    updates.append({'key': row_key, 'image_key': blob_store.put(image_bytes)})
+
+            if updates:
+                conn.execute(
+                    text(f"UPDATE {table} SET profile_image_key = :image_key WHERE {key} = :key"),
+                    updates
+                )
+                moved += len(updates)
+
+        conn.execute(text(f"ALTER TABLE {table} DROP COLUMN profile_image"))
+        summary.append(f"{table}: moved {moved} images to {blob_store.root}")
+    return '; '.join(summary) or None
+
+@migration('0005', 'Add the daily attendance summary')
+def create_daily_summary(conn):
+    if inspect(conn).has_table(AttendanceDailySummary.__tablename__):
+        return None
+    AttendanceDailySummary.__table__.create(conn)
+    return f"built {rebuild_daily_summary()} summary rows"
+
+@migration('0006', 'One attendance per student per day, listing indexes')
+def attendance_indexes(conn):
+    # All but the first record of each (student_id, date) would violate the
+    # unique index. The extra derived table lets MySQL read the table it deletes from.
+    removed = conn.execute(text(
+        "DELETE FROM attendances WHERE id NOT IN ("
+        "SELECT id FROM (SELECT MIN(id) AS id FROM attendances GROUP BY student_id, date) AS keep)"
+    )).rowcount
+
+    created = []
+    for table in (Student.__table__, Attendance.__table__):
+        existing = {index['name'] for index in inspect(conn).get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in existing:
+                index.create(conn)
+                created.append(index.name)
+
+    if removed:
+        # The summary counted the duplicates
+        rebuild_daily_summary()
+
+    summary = []
+    if removed:
+        summary.append(f"removed {removed} duplicate attendance records")
+    if created:
+        summary.append(f"created {', '.join(created)}")
+    return '; '.join(summary) or None
+
+@migration('0007', 'Create the default admin account')
+def default_admin(conn):
+    if Admin.query.count():
+        return None
+    admin = Admin(username='admin', full_name='System Administrator')
+    admin.set_password('admin')
+    db.session.add(admin)
+    return "created admin/admin; change its password"
+
+@migration('0008', 'Add the attendance job queue')
+def create_attendance_jobs(conn):
+    if inspect(conn).has_table(AttendanceJob.__tablename__):
+        return None
+    AttendanceJob.__table__.create(conn)
+    return None
+
+@migration('0009', 'Index the registration request review lists')
+def registration_request_indexes(conn):
+    table = StudentRegistrationRequest.__table__
+    existing = {index['name'] for index in inspect(conn).get_indexes(table.name)}
+    created = []
+    for index in sorted(table.indexes, key=lambda index: index.name):
+        if index.name not in existing:
+            index.create(conn)
+            created.append(index.name)
+    return f"created {', '.join(created)}" if created else None
+
+@migration('0010', 'Add the student import job table')
+def create_student_import_jobs(conn):
+    if inspect(conn).has_table(StudentImportJob.__tablename__):
+        return None
+    StudentImportJob.__table__.create(conn)
+    return None
+
+def applied_versions():
+    """Versions recorded in schema_migrations (empty if the table is missing)"""
+    if not inspect(db.session.connection()).has_table(SchemaMigration.__tablename__):
+        return set()
+    return {version for version, in db.session.query(SchemaMigration.version)}
+
+def pending_migrations():
+    """(version, description, function) of the migrations not yet applied"""
+    applied = applied_versions()
+    return [step for step in MIGRATIONS if step[0] not in applied]
+
+def upgrade(target=None, echo=print):
+    """
+    Applies the pending migrations in order. Needs an app context.
+
+    Args:
+        target: Stop after this version (default: apply all)
+        echo: Called with one progress line per step
+
+    Returns:
+        Number of migrations applied
+
+    Raises:
+        ValueError: if ``target`` is not a known version
+        RuntimeError: if a step fails (naming its version); the steps
+            before it stay applied
+    """
+    versions = [version for version, _, _ in MIGRATIONS]
+    if target is not None and target not in versions:
+        raise ValueError(f"Unknown migration version: {target}")
+    last = versions.index(target) if target is not None else len(versions) - 1
+
+    SchemaMigration.__table__.create(db.session.connection(), checkfirst=True)
+    db.session.commit()
+
+    done = applied_versions()
+    applied = 0
+    for version, description, function in MIGRATIONS[:last + 1]:
+        if version in done:
+            continue
+        try:
+            summary = function(db.session.connection())
+            db.session.add(SchemaMigration(version=version, description=description,
+                                           applied_at=datetime.utcnow()))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Migration {version} failed: {str(e)}")
+            raise RuntimeError(f"Migration {version} ({description}) failed: {str(e)}") from e
+        applied += 1
+        echo(f"{version} {description}" + (f": {summary}" if summary else ''))
+    return applied
@@ -1,4 +1,5 @@
 import os
+import json
 from datetime import datetime
 from enum import Enum
 from flask_sqlalchemy import SQLAlchemy
@@ -33,9 +34,9 @@ class Student(db.Model):
     id = db.Column(db.String(20), primary_key=True)  # Student ID (used as primary key)
     name = db.Column(db.String(100), nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
-    class_name = db.Column(db.String(50), nullable=False)
-    face_encoding = db.Column(db.Text, nullable=True)  # Store as JSON string
-    profile_image = db.Column(db.Text, nullable=True)  # Store base64 image
+    class_name = db.Column(db.String(50), nullable=False, index=True)
+    face_encoding = db.Column(db.LargeBinary, nullable=True)  # Packed binary encoding (see face_utils.pack_encoding)
+    profile_image_key = db.Column(db.String(64), nullable=True)  # Image key in the blob store (see blob_store)
     email = db.Column(db.String(100), nullable=True)  # Optional email for contact
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -54,7 +55,7 @@ class Student(db.Model):
             'class_name': self.class_name,
             'email': self.email,
             'face_encoding': self.face_encoding is not None,
-            'profile_image': self.profile_image,  # Return the actual base64 image data
+            'profile_image_key': self.profile_image_key,  # Served by the profile_image route
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
@@ -65,6 +66,11 @@ class RequestStatus(Enum):
 
 class StudentRegistrationRequest(db.Model):
     __tablename__ = 'student_registration_requests'
+    __table_args__ = (
+        # Keyset pagination orders of the review lists (see queries.registration_request_page)
+        db.Index('ix_registration_requests_status_created', 'status', 'created_at', 'id'),
+        db.Index('ix_registration_requests_status_updated', 'status', 'updated_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.String(20), unique=True, nullable=False)
@@ -72,8 +78,8 @@ class StudentRegistrationRequest(db.Model):
     password_hash = db.Column(db.String(256), nullable=False)
     class_name = db.Column(db.String(50), nullable=False)
     email = db.Column(db.String(100), nullable=True)
-    profile_image = db.Column(db.Text, nullable=True)  # Store base64 image
-    face_encoding = db.Column(db.Text, nullable=True)  # Store as JSON string
+    profile_image_key = db.Column(db.String(64), nullable=True)  # Image key in the blob store (see blob_store)
+    face_encoding = db.Column(db.LargeBinary, nullable=True)  # Packed binary encoding (see face_utils.pack_encoding)
     status = db.Column(db.String(20), default=RequestStatus.PENDING.value, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -90,7 +96,7 @@ class StudentRegistrationRequest(db.Model):
             'class_name': self.class_name,
             'email': self.email,
             'face_encoding': self.face_encoding is not None,
-            'profile_image': self.profile_image,  # Return the actual base64 image data
+            'profile_image_key': self.profile_image_key,  # Served by the profile_image route
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
@@ -98,6 +104,12 @@ class StudentRegistrationRequest(db.Model):
 
 class Attendance(db.Model):
     __tablename__ = 'attendances'
+    __table_args__ = (
+        # One record per student per day; also serves lookups by student_id
+        db.Index('uq_attendances_student_date', 'student_id', 'date', unique=True),
+        # Keyset pagination order of the attendance listings (newest first)
+        db.Index('ix_attendances_date_id', 'date', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.String(20), db.ForeignKey('students.id'), nullable=False)
@@ -113,24 +125,94 @@ class Attendance(db.Model):
             'student_name': self.student.name if self.student else None,
             'date': self.date.strftime('%Y-%m-%d') if self.date else None,
             'time': self.time.strftime('%H:%M:%S') if self.time else None,
+            'status': self.status,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
         }
 
-# Initialize the database with a default admin user
-def init_db(app):
-    db.init_app(app)
-    
-    with app.app_context():
-        db.create_all()
-        
-        # Check if there's at least one admin user
-        if Admin.query.count() == 0:
-            # Create a default admin with username 'admin' and password 'admin'
-            default_admin = Admin(
-                username='admin',
-                full_name='System Administrator'
-            )
-            default_admin.set_password('admin')
-            db.session.add(default_admin)
-            db.session.commit()
-            print("Default admin account created with username: admin, password: admin")
\ No newline at end of file
+class AttendanceDailySummary(db.Model):
+    """Present and enrolled student counts per day and class (see attendance_summary)"""
+    __tablename__ = 'attendance_daily_summary'
+    
+    date = db.Column(db.Date, primary_key=True)
+    class_name = db.Column(db.String(50), primary_key=True)
+    present_count = db.Column(db.Integer, nullable=False, default=0)
+    enrolled_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'date': self.date.strftime('%Y-%m-%d') if self.date else None,
+            'class_name': self.class_name,
+            'present_count': self.present_count,
+            'enrolled_count': self.enrolled_count
+        }
+
+class AttendanceJob(db.Model):
+    """Attendance photo queued for face verification (see attendance_jobs)"""
+    __tablename__ = 'attendance_jobs'
+    __table_args__ = (
+        # The sweep looks for old pending and stuck running jobs
+        db.Index('ix_attendance_jobs_status_created', 'status', 'created_at'),
+    )
+    
+    id = db.Column(db.String(32), primary_key=True)
+    student_id = db.Column(db.String(20), db.ForeignKey('students.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, done, failed
+    date = db.Column(db.Date, nullable=False)  # Day the photo was taken, recorded as attended
+    image = db.Column(db.LargeBinary, nullable=True)  # Cleared once processed
+    category = db.Column(db.String(20), nullable=True)  # Flash category of the result
+    message = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'category': self.category,
+            'message': self.message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class StudentImportJob(db.Model):
+    """Roster and photo ZIP being imported in the background (see student_import)"""
+    __tablename__ = 'student_import_jobs'
+    
+    id = db.Column(db.String(32), primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, done, failed
+    roster = db.Column(db.Text, nullable=True)  # Roster CSV, cleared once processed
+    archive_path = db.Column(db.String(500), nullable=True)  # Uploaded ZIP on disk, deleted once processed
+    processed = db.Column(db.Integer, nullable=False, default=0)  # Candidates encoded so far
+    total = db.Column(db.Integer, nullable=False, default=0)  # Candidates to encode
+    imported = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    failures = db.Column(db.Text, nullable=True)  # JSON list of the rows that failed
+    message = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=True)  # Last progress, to spot dead jobs
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'processed': self.processed,
+            'total': self.total,
+            'imported': self.imported,
+            'failed': self.failed,
+            'failures': json.loads(self.failures) if self.failures else [],
+            'message': self.message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class SchemaMigration(db.Model):
+    """Migrations applied to this database (see migrations.py)"""
+    __tablename__ = 'schema_migrations'
+    
+    version = db.Column(db.String(20), primary_key=True)
+    description = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,263 @@
+import json
+import base64
+import binascii
+from datetime import date, datetime
+from sqlalchemy import and_, case, func, literal, or_
+
+from models import db, Student, Attendance, StudentRegistrationRequest, RequestStatus
+
+# Keeps IN (...) lists well under every database's parameter limit
+IN_CHUNK_SIZE = 500
+
+def chunked(items, size=IN_CHUNK_SIZE):
+    """Yields ``items`` as lists of at most ``size``, e.g. one per IN (...) query"""
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _like_pattern(text):
+    """Substring LIKE pattern with the wildcards in ``text`` escaped"""
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+def attendance_stats_subquery():
+    """
+    Per-student attendance totals in one grouped pass over attendances.
+
+    Columns: student_id, total_days, present_days, latest_date
+    """
+    return db.session.query(
+        Attendance.student_id.label('student_id'),
+        func.count(Attendance.id).label('total_days'),
+        func.sum(case((Attendance.status == 'present', 1), else_=0)).label('present_days'),
+        func.max(Attendance.date).label('latest_date')
+    ).group_by(Attendance.student_id).subquery()
+
+def student_profiles_query(search='', class_filter='', sort_by='name'):
+    """
+    Students with their attendance percentage and latest attendance date.
+
+    Search, class filter and sort are applied in SQL, so the query can be
+    paginated without loading every student.
+
+    Args:
+        search: Case-insensitive substring of the name or student ID
+        class_filter: Exact class name
+        sort_by: 'name', 'id' or 'attendance' (highest first)
+
+    Returns:
+        Query yielding (Student, attendance_percentage, latest_date) rows
+    """
+    stats = attendance_stats_subquery()
+    total_days = func.coalesce(stats.c.total_days, 0)
+    attendance_percentage = case(
+        (total_days > 0, 100.0 * func.coalesce(stats.c.present_days, 0) / total_days),
+        else_=0.0
+    ).label('attendance_percentage')
+
+    query = db.session.query(Student, attendance_percentage, stats.c.latest_date).outerjoin(
+        stats, stats.c.student_id == Student.id
+    ).options(
+        # Listing pages never need the encoding or password hash
+        db.defer(Student.face_encoding),
+        db.defer(Student.password_hash)
+    )
+
+    if search:
+        pattern = _like_pattern(search)
+        query = query.filter(or_(Student.name.ilike(pattern, escape='\\'),
+                                 Student.id.ilike(pattern, escape='\\')))
+
+    if class_filter:
+        query = query.filter(Student.class_name == class_filter)
+
+    if sort_by == 'id':
+        query = query.order_by(Student.id)
+    elif sort_by == 'attendance':
+        query = query.order_by(attendance_percentage.desc(), Student.name, Student.id)
+    else:
+        query = query.order_by(Student.name, Student.id)
+
+    return query
+
+def class_names():
+    """Sorted distinct class names of enrolled students"""
+    rows = db.session.query(Student.class_name).filter(
+        Student.class_name.isnot(None), Student.class_name != ''
+    ).distinct().order_by(Student.class_name)
+    return [class_name for class_name, in rows]
+
+def encode_cursor(*values):
+    """Opaque keyset cursor for the last row of a page"""
+    raw = json.dumps([value.isoformat() if isinstance(value, date) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, size):
+    """
+    Values of a cursor made by ``encode_cursor`` from ``size`` values.
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+def attendance_page(limit=50, cursor=None, class_name=None, date_from=None, date_to=None,
+                    student_id=None):
+    """
+    One page of attendance records, newest first, by keyset pagination.
+
+    Records are ordered by (date, id) descending and the page starts after
+    the row the cursor points at, so every page costs the same however far
+    back it is. Student names are loaded by the same query.
+
+    Args:
+        limit: Page size
+        cursor: ``next_cursor`` of the previous page, or None for the first
+        class_name: Only students of this class
+        date_from, date_to: Inclusive date range
+        student_id: Only this student
+
+    Returns:
+        (records, next_cursor): Attendance objects with ``student`` loaded,
+        and the cursor of the next page (None on the last page)
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    query = Attendance.query.join(Attendance.student).options(
+        db.contains_eager(Attendance.student).load_only(Student.id, Student.name, Student.class_name)
+    )
+
+    if class_name:
+        query = query.filter(Student.class_name == class_name)
+    if date_from:
+        query = query.filter(Attendance.date >= date_from)
+    if date_to:
+        query = query.filter(Attendance.date <= date_to)
+    if student_id:
+        query = query.filter(Attendance.student_id == student_id)
+
+    if cursor:
+        after_date, after_id = decode_cursor(cursor, 2)
+        try:
+            after_date = date.fromisoformat(after_date)
+        except TypeError:
+            raise ValueError("Invalid cursor")
+        query = query.filter(or_(Attendance.date < after_date,
+                                 and_(Attendance.date == after_date, Attendance.id < after_id)))
+
+    # One extra row tells whether there is a next page
+    records = query.order_by(Attendance.date.desc(), Attendance.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        next_cursor = encode_cursor(records[-1].date, records[-1].id)
+    return records, next_cursor
+
+def student_page(limit=50, cursor=None, class_name=None, search=None, on_date=None):
+    """
+    One page of students ordered by ID, by keyset pagination.
+
+    Args:
+        limit: Page size
+        cursor: ``next_cursor`` of the previous page, or None for the first
+        class_name: Only this class
+        search: Case-insensitive substring of the name or student ID
+        on_date: Also report whether each student attended on this date
+
+    Returns:
+        (rows, next_cursor): rows of (id, name, class_name, email, present),
+        where ``present`` is None unless ``on_date`` is given
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    if on_date is not None:
+        present = db.session.query(Attendance.id).filter(
+            Attendance.student_id == Student.id, Attendance.date == on_date
+        ).exists().label('present')
+    else:
+        present = literal(None).label('present')
+
+    query = db.session.query(Student.id, Student.name, Student.class_name, Student.email, present)
+
+    if class_name:
+        query = query.filter(Student.class_name == class_name)
+    if search:
+        pattern = _like_pattern(search)
+        query = query.filter(or_(Student.name.ilike(pattern, escape='\\'),
+                                 Student.id.ilike(pattern, escape='\\')))
+    if cursor:
+        after_id, = decode_cursor(cursor, 1)
+        query = query.filter(Student.id > after_id)
+
+    rows = query.order_by(Student.id).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+    return rows, next_cursor
+
+def registration_request_counts():
+    """Number of registration requests per status, from one grouped query"""
+    counts = {status.value: 0 for status in RequestStatus}
+    rows = db.session.query(StudentRegistrationRequest.status, func.count(StudentRegistrationRequest.id)).group_by(
+        StudentRegistrationRequest.status
+    )
+    counts.update({status: count for status, count in rows})
+    return counts
+
+def registration_request_page(status, limit=50, cursor=None):
+    """
+    One page of registration requests with ``status``, by keyset pagination.
+
+    Pending requests are ordered by when they were made, reviewed ones by
+    when they were reviewed, newest first. Only the listed columns are
+    loaded, not the face encoding or password hash.
+
+    Args:
+        status: RequestStatus value
+        limit: Page size
+        cursor: ``next_cursor`` of the previous page, or None for the first
+
+    Returns:
+        (requests, next_cursor): StudentRegistrationRequest objects and the
+        cursor of the next page (None on the last page)
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    model = StudentRegistrationRequest
+    order_column = model.created_at if status == RequestStatus.PENDING.value else model.updated_at
+
+    query = model.query.options(db.load_only(
+        model.id, model.student_id, model.name, model.class_name, model.email,
+        model.profile_image_key, model.status, model.created_at, model.updated_at, model.admin_notes
+    )).filter(model.status == status)
+
+    if cursor:
+        after_time, after_id = decode_cursor(cursor, 2)
+        try:
+            after_time = datetime.fromisoformat(after_time)
+        except TypeError:
+            raise ValueError("Invalid cursor")
+        query = query.filter(or_(order_column < after_time,
+                                 and_(order_column == after_time, model.id < after_id)))
+
+    requests = query.order_by(order_column.desc(), model.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(requests) > limit:
+        requests = requests[:limit]
+        last = requests[-1]
+        next_cursor = encode_cursor(getattr(last, order_column.key), last.id)
+    return requests, next_cursor
@@ -0,0 +1,182 @@
+import logging
+from collections import Counter
+from datetime import datetime
+import numpy as np
+
+from attendance_summary import adjust_enrolment
+from encoding_cache import encoding_cache
+from face_utils import encoding_encoder_name, get_encoder, unpack_encoding
+from models import db, Student, StudentRegistrationRequest, RequestStatus
+from queries import chunked
+from thumbnails import thumbnail_cache
+
+logger = logging.getLogger(__name__)
+
+REVIEW_ACTIONS = ('approve', 'reject')
+
+# Most requests one review may cover
+REVIEW_MAX_REQUESTS = 5000
+
+def duplicate_matches(encodings):
+    """
+    Registration faces that closely match an already enrolled student.
+
+    All faces are compared against every cached enrolled encoding at once
+    (see EncodingCache.identify_many). Faces from an encoder other than the
+    cache's cannot be compared and are never flagged.
+
+    Args:
+        encodings: Dict of request ID to packed face encoding (or None)
+
+    Returns:
+        Dict of request ID to (student_id, distance) for the faces within
+        the encoder's match threshold of an enrolled student
+    """
+    request_ids = []
+    probes = []
+    for request_id, face_encoding in encodings.items():
+        if face_encoding is None or encoding_encoder_name(face_encoding) != encoding_cache.encoder:
+            continue
+        request_ids.append(request_id)
+        probes.append(np.asarray(unpack_encoding(face_encoding), dtype=np.float32).ravel())
+
+    if not probes:
+        return {}
+
+    threshold = get_encoder(encoding_cache.encoder).threshold
+    matches = encoding_cache.identify_many(np.vstack(probes))
+    return {request_id: (student_id, distance)
+            for request_id, (student_id, distance) in zip(request_ids, matches)
+            if student_id is not None and distance < threshold}
+
+def pending_duplicates(request_ids):
+    """``duplicate_matches`` for the listed requests, read from the database"""
+    encodings = {}
+    for chunk in chunked(request_ids):
+        encodings.update(db.session.query(
+            StudentRegistrationRequest.id, StudentRegistrationRequest.face_encoding
+        ).filter(StudentRegistrationRequest.id.in_(chunk)))
+    return duplicate_matches(encodings)
+
+def review_requests(request_ids, action, admin_notes='', skip_duplicates=False):
+    """
+    Approves or rejects many registration requests in one transaction.
+
+    Requests are read with a few IN queries. Approval inserts the new
+    students with bulk INSERTs, and both actions update the requests with
+    bulk UPDATEs that only match pending rows, so a request reviewed
+    concurrently fails the whole review instead of being reviewed twice.
+    Commits the session, then caches the approved students' encodings and
+    thumbnails.
+
+    Args:
+        request_ids: IDs of the requests
+        action: 'approve' or 'reject'
+        admin_notes: Notes stored on every reviewed request
+        skip_duplicates: Leave pending the requests whose face matches an
+            enrolled student (approve only)
+
+    Returns:
+        (results, counts): one {'request_id', 'student_id', 'result'[,
+        'message'][, 'duplicate_of', 'distance']} per request, ``result``
+        being 'approved', 'rejected', 'skipped' or 'error', and the number
+        of each result
+
+    Raises:
+        ValueError: if the action or IDs are invalid, or another admin
+            reviewed one of the requests meanwhile
+    """
+    if action not in REVIEW_ACTIONS:
+        raise ValueError(f"action must be one of {', '.join(REVIEW_ACTIONS)}")
+    try:
+        request_ids = list(dict.fromkeys(int(request_id) for request_id in request_ids))
+    except (TypeError, ValueError):
+        raise ValueError('Request IDs must be integers')
+    if len(request_ids) > REVIEW_MAX_REQUESTS:
+        raise ValueError(f'{len(request_ids)} requests sent, at most {REVIEW_MAX_REQUESTS} allowed')
+
+    model = StudentRegistrationRequest
+    columns = [model.id, model.student_id, model.status]
+    if action == 'approve':
+        columns += [model.name, model.password_hash, model.class_name, model.email,
+                    model.face_encoding, model.profile_image_key]
+    found = {}
+    for chunk in chunked(request_ids):
+        found.update((row.id, row) for row in db.session.query(*columns).filter(model.id.in_(chunk)))
+
+    results = []
+    reviewable = []
+    for request_id in request_ids:
+        row = found.get(request_id)
+        result = {'request_id': request_id, 'student_id': row.student_id if row else None}
+        results.append(result)
+        if row is None:
+            result.update(result='error', message='Request not found')
+        elif row.status != RequestStatus.PENDING.value:
+            result.update(result='error', message=f'Request already {row.status}')
+        else:
+            reviewable.append((result, row))
+
+    if action == 'approve' and reviewable:
+        enrolled = set()
+        for chunk in chunked(row.student_id for _, row in reviewable):
+            enrolled.update(student_id for student_id, in
+                            db.session.query(Student.id).filter(Student.id.in_(chunk)))
+        duplicates = duplicate_matches({row.id: row.face_encoding for _, row in reviewable})
+
+        approvable = []
+        for result, row in reviewable:
+            if row.student_id in enrolled:
+                result.update(result='error', message='A student with this ID already exists')
+                continue
+            if row.id in duplicates:
+                student_id, distance = duplicates[row.id]
+                result.update(duplicate_of=student_id, distance=round(distance, 4))
+                if skip_duplicates:
+                    result.update(result='skipped', message=f'Face matches enrolled student {student_id}')
+                    continue
+            approvable.append((result, row))
+        reviewable = approvable
+
+    now = datetime.utcnow()
+    status = RequestStatus.APPROVED.value if action == 'approve' else RequestStatus.REJECTED.value
+    try:
+        for chunk in chunked(reviewable):
+            if action == 'approve':
+                db.session.execute(db.insert(Student), [{
+                    'id': row.student_id, 'name': row.name, 'password_hash': row.password_hash,
+                    'class_name': row.class_name, 'email': row.email,
+                    'face_encoding': row.face_encoding, 'profile_image_key': row.profile_image_key,
+                    'created_at': now
+                } for _, row in chunk])
+
+            updated = db.session.execute(
+                db.update(model).where(
+                    model.id.in_([row.id for _, row in chunk]),
+                    model.status == RequestStatus.PENDING.value
+                ).values(status=status, admin_notes=admin_notes, updated_at=now)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if updated != len(chunk):
+                raise ValueError('Some requests were reviewed by someone else meanwhile; reload and try again')
+        if action == 'approve':
+            for class_name, count in Counter(row.class_name for _, row in reviewable).items():
+                adjust_enrolment(class_name, now, count)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    for result, row in reviewable:
+        result['result'] = status
+        if action != 'approve':
+            continue
+        if row.face_encoding is not None:
+            encoding_cache.put(row.student_id, unpack_encoding(row.face_encoding),
+                               encoding_encoder_name(row.face_encoding))
+        if row.profile_image_key:
+            thumbnail_cache.warm(row.profile_image_key)
+
+    counts = Counter(result['result'] for result in results)
+    logger.info(f"Reviewed {len(request_ids)} registration requests: {dict(counts)}")
+    return results, counts
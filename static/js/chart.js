@@ -1,25 +1,40 @@
 /**
  * Chart utilities for attendance visualization
  */
-function initAttendanceChart(chartElementId, dates, counts) {
+function initAttendanceChart(chartElementId, dates, counts, enrolled) {
     // Get the canvas element
     const ctx = document.getElementById(chartElementId).getContext('2d');
     
+    const datasets = [{
+        label: 'Students Present',
+        data: counts,
+        backgroundColor: 'rgba(54, 162, 235, 0.2)',
+        borderColor: 'rgba(54, 162, 235, 1)',
+        borderWidth: 2,
+        tension: 0.3,
+        pointBackgroundColor: 'rgba(54, 162, 235, 1)',
+        pointRadius: 4
+    }];
+    
+    // Enrolled students per day, from the daily summary
+    if (enrolled && enrolled.length) {
+        datasets.push({
+            label: 'Students Enrolled',
+            data: enrolled,
+            borderColor: 'rgba(201, 203, 207, 1)',
+            borderWidth: 1,
+            borderDash: [5, 5],
+            fill: false,
+            pointRadius: 0
+        });
+    }
+    
     // Create the chart
     const chart = new Chart(ctx, {
         type: 'line',
         data: {
             labels: dates,
-            datasets: [{
-                label: 'Students Present',
-                data: counts,
-                backgroundColor: 'rgba(54, 162, 235, 0.2)',
-                borderColor: 'rgba(54, 162, 235, 1)',
-                borderWidth: 2,
-                tension: 0.3,
-                pointBackgroundColor: 'rgba(54, 162, 235, 1)',
-                pointRadius: 4
-            }]
+            datasets: datasets
         },
         options: {
             responsive: true,
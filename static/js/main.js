@@ -16,6 +16,9 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Set up validation for forms
     setupFormValidation();
+
+    // Bulk attendance form on the manage attendance page
+    setupBulkAttendance();
 });
 
 function initializeWebcam() {
@@ -32,6 +35,7 @@ function initializeWebcam() {
             const retakeButtonId = isAttendancePage ? 'retake-btn' : 'retake-face-btn';
             const saveButtonId = isAttendancePage ? 'submit-attendance-btn' : 'submit-student-btn';
             const imageInputId = isAttendancePage ? 'face-image' : 'face-image';
+            const fileInputId = 'face-image-file';
             
             const webcam = new WebcamCapture(
                 videoElement,
@@ -39,7 +43,8 @@ function initializeWebcam() {
                 captureButtonId,
                 retakeButtonId,
                 saveButtonId,
-                imageInputId
+                imageInputId,
+                fileInputId
             );
             
             webcam.start().then(success => {
@@ -55,6 +60,10 @@ function initializeWebcam() {
                     if (!webcam.isCaptured()) {
                         event.preventDefault();
                         alert('Please capture your face image first.');
+                    } else if (form.dataset.async === 'true') {
+                        // Queue the photo and wait for the background check
+                        event.preventDefault();
+                        submitAttendanceJob(form);
                     }
                 });
             }
@@ -62,6 +71,59 @@ function initializeWebcam() {
     }
 }
 
+function showFaceFeedback(message, iconClass) {
+    const feedback = document.getElementById('face-feedback');
+    if (!feedback) return;
+    feedback.style.display = 'block';
+    document.getElementById('face-feedback-message').textContent = message;
+    document.getElementById('face-feedback-icon').className = iconClass;
+}
+
+function submitAttendanceJob(form) {
+    const submitButton = document.getElementById('submit-attendance-btn');
+    if (submitButton) submitButton.disabled = true;
+    showFaceFeedback('Uploading...', 'fas fa-spinner fa-spin fa-2x mb-2 text-info');
+
+    fetch(form.action, {
+        method: 'POST',
+        body: new FormData(form),
+        headers: { 'Accept': 'application/json' }
+    })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) throw new Error(data.message);
+            showFaceFeedback('Checking your face...', 'fas fa-spinner fa-spin fa-2x mb-2 text-info');
+            pollAttendanceJob(data.status_url, 0);
+        })
+        .catch(error => {
+            showFaceFeedback(error.message || 'An error occurred. Please try again.',
+                             'fas fa-times-circle fa-2x mb-2 text-danger');
+            if (submitButton) submitButton.disabled = false;
+        });
+}
+
+function pollAttendanceJob(statusUrl, attempt) {
+    // Back off from 0.5s to 2s between polls
+    const delay = Math.min(500 * (attempt + 1), 2000);
+
+    setTimeout(() => {
+        fetch(statusUrl, { headers: { 'Accept': 'application/json' } })
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) throw new Error(data.message);
+                if (data.redirect_url) {
+                    window.location.href = data.redirect_url;
+                } else {
+                    pollAttendanceJob(statusUrl, attempt + 1);
+                }
+            })
+            .catch(error => {
+                showFaceFeedback(error.message || 'An error occurred. Please try again.',
+                                 'fas fa-times-circle fa-2x mb-2 text-danger');
+            });
+    }, delay);
+}
+
 function initializeCharts() {
     // Check if we're on the admin dashboard
     const attendanceChartElement = document.getElementById('attendance-chart');
@@ -71,10 +133,12 @@ function initializeCharts() {
         // Get chart data from data attributes
         let dates = [];
         let counts = [];
+        let enrolled = [];
         
         try {
             const datesAttr = attendanceChartElement.getAttribute('data-dates');
             const countsAttr = attendanceChartElement.getAttribute('data-counts');
+            const enrolledAttr = attendanceChartElement.getAttribute('data-enrolled');
             
             if (datesAttr && datesAttr !== 'null' && datesAttr !== '') {
                 dates = JSON.parse(datesAttr);
@@ -83,20 +147,26 @@ function initializeCharts() {
             if (countsAttr && countsAttr !== 'null' && countsAttr !== '') {
                 counts = JSON.parse(countsAttr);
             }
+            
+            if (enrolledAttr && enrolledAttr !== 'null' && enrolledAttr !== '') {
+                enrolled = JSON.parse(enrolledAttr);
+            }
         } catch (e) {
             console.error('Error parsing chart data:', e);
             dates = [];
             counts = [];
+            enrolled = [];
         }
         
         // Provide defaults if data is empty
         if (!dates.length) {
             dates = ['No Data'];
             counts = [0];
+            enrolled = [];
         }
         
         // Initialize attendance chart
-        initAttendanceChart('attendance-chart', dates, counts);
+        initAttendanceChart('attendance-chart', dates, counts, enrolled);
     }
     
     if (distributionChartElement) {
@@ -138,3 +208,43 @@ function setupFormValidation() {
         }, false);
     });
 }
+
+function setupBulkAttendance() {
+    const form = document.getElementById('bulk-attendance-form');
+    if (!form) return;
+
+    form.addEventListener('submit', event => {
+        event.preventDefault();
+        if (!form.checkValidity()) return;
+
+        const result = document.getElementById('bulk-attendance-result');
+        const buttons = form.querySelectorAll('button[type="submit"]');
+        const body = new FormData(form);
+        body.append('dry_run', event.submitter && event.submitter.value === 'preview' ? '1' : '0');
+        buttons.forEach(button => { button.disabled = true; });
+
+        fetch(form.action, { method: 'POST', body: body, headers: { 'Accept': 'application/json' } })
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) throw new Error(data.message);
+                const counts = data.counts;
+                let message = `${data.dry_run ? 'Preview: ' : ''}${counts.marked} marked present, ` +
+                              `${counts.removed} marked absent, ${counts.unchanged} unchanged, ${counts.error} errors.`;
+                const errors = data.results.filter(row => row.result === 'error').slice(0, 10);
+                errors.forEach(row => {
+                    message += `\nRow ${row.row} (${row.student_id || '-'}, ${row.date || '-'}): ${row.message}`;
+                });
+                result.className = `alert ${counts.error ? 'alert-warning' : 'alert-success'} mt-3 mb-0`;
+                result.textContent = message;
+            })
+            .catch(error => {
+                result.className = 'alert alert-danger mt-3 mb-0';
+                result.textContent = error.message || 'An error occurred. Please try again.';
+            })
+            .finally(() => {
+                result.style.display = 'block';
+                result.style.whiteSpace = 'pre-line';
+                buttons.forEach(button => { button.disabled = false; });
+            });
+    });
+}
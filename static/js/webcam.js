@@ -2,13 +2,14 @@
  * Webcam handling utility for face capture
  */
 class WebcamCapture {
-    constructor(videoElement, canvasElement, captureButtonId, retakeButtonId, saveButtonId, imageInputId) {
+    constructor(videoElement, canvasElement, captureButtonId, retakeButtonId, saveButtonId, imageInputId, fileInputId) {
         this.video = videoElement;
         this.canvas = canvasElement;
         this.captureButton = document.getElementById(captureButtonId);
         this.retakeButton = document.getElementById(retakeButtonId);
         this.saveButton = document.getElementById(saveButtonId);
         this.imageInput = document.getElementById(imageInputId);
+        this.fileInput = fileInputId ? document.getElementById(fileInputId) : null;
         
         this.stream = null;
         this.captured = false;
@@ -75,11 +76,30 @@ class WebcamCapture {
         if (this.retakeButton) this.retakeButton.style.display = 'inline-block';
         if (this.saveButton) this.saveButton.style.display = 'inline-block';
         
+        // Attach the frame as a JPEG file so the form uploads it as binary
+        // multipart data; fall back to a base64 data URL in the hidden input
+        if (this.fileInput && this.canvas.toBlob && typeof DataTransfer !== 'undefined') {
+            this.canvas.toBlob(blob => {
+                try {
+                    const transfer = new DataTransfer();
+                    transfer.items.add(new File([blob], 'face.jpg', { type: 'image/jpeg' }));
+                    this.fileInput.files = transfer.files;
+                    if (this.imageInput) this.imageInput.value = '';
+                } catch (error) {
+                    this.storeDataURL();
+                }
+                this.captured = true;
+            }, 'image/jpeg', 0.9);
+        } else {
+            this.storeDataURL();
+            this.captured = true;
+        }
+    }
+    
+    storeDataURL() {
         // Store image data in hidden input
         const imageData = this.canvas.toDataURL('image/jpeg');
         if (this.imageInput) this.imageInput.value = imageData;
-        
-        this.captured = true;
     }
     
     retake() {
@@ -92,6 +112,7 @@ class WebcamCapture {
         
         // Clear image data
         if (this.imageInput) this.imageInput.value = '';
+        if (this.fileInput) this.fileInput.value = '';
         
         this.captured = false;
     }
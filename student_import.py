@@ -0,0 +1,420 @@
+import io
+import csv
+import os
+import json
+import queue
+import uuid
+import logging
+import threading
+import zipfile
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+
+from attendance_summary import adjust_enrolment
+from blob_store import blob_store
+from encoding_cache import encoding_cache
+from face_utils import DEFAULT_ENCODER, encode_face, pack_encoding, warm_up
+from image_utils import LazyModule, decode_image
+from models import db, Student, StudentImportJob
+from queries import chunked
+
+logger = logging.getLogger(__name__)
+
+cv2 = LazyModule('cv2')
+
+ROSTER_COLUMNS = ('student_id', 'name', 'class_name', 'password')
+
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+# Larger ZIP members are rejected rather than read into memory
+MAX_PHOTO_BYTES = 10 * 1024 * 1024
+
+# Students per INSERT transaction
+IMPORT_BATCH_SIZE = 100
+
+def init_encoding_worker():
+    """Process pool initializer: one OpenCV thread per process, detectors loaded"""
+    cv2.setNumThreads(1)
+    warm_up()
+
+def encode_profile_image(student_id, image_bytes, encoder):
+    """
+    Encodes one profile image (runs in a worker process).
+
+    Returns:
+        (student_id, packed encoding or None, error message or None)
+    """
+    try:
+        image = decode_image(image_bytes)
+        if image is None:
+            return student_id, None, 'could not decode profile image'
+
+        encoding = encode_face(image, encoder=encoder)
+        if encoding is None:
+            return student_id, None, 'no face detected'
+
+        return student_id, pack_encoding(encoding, encoder=encoder), None
+    except Exception as e:
+        return student_id, None, str(e)
+
+def _prepare_student(row, image_bytes, encoder):
+    """
+    Column values of a new student (runs in a worker process).
+
+    The password hash is computed here too: at a few hundred milliseconds
+    each it costs more than the face encoding.
+
+    Returns:
+        (student_id, values or None, error message or None)
+    """
+    student_id, packed, error = encode_profile_image(row['student_id'], image_bytes, encoder)
+    if packed is None:
+        return student_id, None, error
+    return student_id, {
+        'id': student_id,
+        'name': row['name'],
+        'class_name': row['class_name'],
+        'email': row.get('email') or None,
+        'password_hash': generate_password_hash(row['password']),
+        'face_encoding': packed
+    }, None
+
+def parse_roster(text):
+    """
+    Rows of a roster CSV with student_id, name, class_name and password
+    columns, and optionally email and photo (the file name in the ZIP,
+    default: the student ID with any image extension).
+
+    Returns:
+        List of dicts keyed by the lower-cased column names
+
+    Raises:
+        ValueError: if a required column is missing
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    fields = {name.strip().lower() for name in reader.fieldnames or []}
+    missing = [column for column in ROSTER_COLUMNS if column not in fields]
+    if missing:
+        raise ValueError(f"Roster is missing the {', '.join(missing)} column(s)")
+
+    return [{(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+            for row in reader]
+
+def index_photos(archive):
+    """
+    Image members of a ZIP by file name and by file name without extension.
+
+    Folders inside the archive are ignored, so photos/S001.jpg is found as
+    S001.jpg and S001. Nothing is extracted.
+    """
+    photos = {}
+    for info in archive.infolist():
+        name = os.path.basename(info.filename)
+        stem, extension = os.path.splitext(name)
+        if info.is_dir() or name.startswith('.') or '__MACOSX' in info.filename:
+            continue
+        if extension.lower() not in PHOTO_EXTENSIONS:
+            continue
+        photos.setdefault(name, info)
+        photos.setdefault(stem, info)
+    return photos
+
+def _existing_ids(student_ids):
+    existing = set()
+    for chunk in chunked(student_ids):
+        existing.update(student_id for student_id, in
+                        db.session.query(Student.id).filter(Student.id.in_(chunk)))
+    return existing
+
+def _insert_students(batch):
+    """
+    Inserts the prepared students of one batch, and their enrolment in the
+    daily summary, in one transaction. If a student ID was taken meanwhile,
+    retries row by row so the others still go in.
+
+    Args:
+        batch: (result, image bytes, future of _prepare_student) tuples
+    """
+    rows = []
+    for result, image_bytes, future in batch:
+        _, values, error = future.result()
+        if values is None:
+            result.update(result='error', message=error)
+            continue
+        values['profile_image_key'] = blob_store.put(image_bytes)
+        rows.append((result, values))
+
+    if not rows:
+        return
+
+    now = datetime.utcnow()
+    for _, values in rows:
+        values['created_at'] = now
+
+    try:
+        db.session.execute(db.insert(Student), [values for _, values in rows])
+        for class_name, count in Counter(values['class_name'] for _, values in rows).items():
+            adjust_enrolment(class_name, now, count)
+        db.session.commit()
+        for result, _ in rows:
+            result['result'] = 'imported'
+        return
+    except IntegrityError:
+        db.session.rollback()
+
+    for result, values in rows:
+        try:
+            db.session.execute(db.insert(Student), [values])
+            adjust_enrolment(values['class_name'], now, 1)
+            db.session.commit()
+            result['result'] = 'imported'
+        except IntegrityError:
+            db.session.rollback()
+            result.update(result='error', message='student ID already exists')
+
+def import_students(roster, archive, workers=None, batch_size=IMPORT_BATCH_SIZE, encoder=None,
+                    progress=None):
+    """
+    Enrols a roster of students with their photos.
+
+    Rows are validated first (required fields, IDs repeated in the roster
+    or already enrolled, photo present in the ZIP). Photos are then read
+    from the ZIP one batch at a time and encoded, with the passwords
+    hashed, by a pool of ``workers`` processes; while the pool works on
+    the next batch, the finished one is inserted in a single transaction.
+    Needs an app context.
+
+    Args:
+        roster: Rows from ``parse_roster``
+        archive: zipfile.ZipFile of the photos
+        workers: Worker processes (default: CPU count)
+        batch_size: Students per transaction
+        encoder: Face encoder (default: DEFAULT_ENCODER)
+        progress: Called with (students processed, total) after each batch
+
+    Returns:
+        (results, counts): one {'row', 'student_id', 'name', 'result'[,
+        'message']} per roster row, ``result`` being 'imported' or 'error',
+        and the number of each result
+    """
+    encoder = encoder or DEFAULT_ENCODER
+    photos = index_photos(archive)
+
+    existing = _existing_ids({row['student_id'] for row in roster if row.get('student_id')})
+
+    results = []
+    candidates = []
+    seen = set()
+    for row_number, row in enumerate(roster, start=1):
+        student_id = row.get('student_id', '')
+        result = {'row': row_number, 'student_id': student_id, 'name': row.get('name', '')}
+        results.append(result)
+
+        missing = [column for column in ROSTER_COLUMNS if not row.get(column)]
+        photo = photos.get(row.get('photo') or student_id)
+        if missing:
+            result.update(result='error', message=f"missing {', '.join(missing)}")
+        elif len(student_id) > Student.id.type.length:
+            result.update(result='error', message=f'student ID longer than {Student.id.type.length} characters')
+        elif student_id in seen:
+            result.update(result='error', message='student ID repeated in the roster')
+        elif student_id in existing:
+            result.update(result='error', message='student ID already exists')
+        elif photo is None:
+            result.update(result='error', message='no photo in the ZIP')
+        elif photo.file_size > MAX_PHOTO_BYTES:
+            result.update(result='error', message=f'photo larger than {MAX_PHOTO_BYTES // (1024 * 1024)} MB')
+        else:
+            candidates.append((result, row, photo))
+        seen.add(student_id)
+
+    if candidates:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_encoding_worker) as pool:
+            pending = deque()
+            done = 0
+            for start in range(0, len(candidates), batch_size):
+                batch = []
+                for result, row, photo in candidates[start:start + batch_size]:
+                    image_bytes = archive.read(photo)
+                    batch.append((result, image_bytes, pool.submit(_prepare_student, row, image_bytes, encoder)))
+                pending.append(batch)
+
+                # Keep one batch queued so the pool stays busy during the INSERT
+                if len(pending) > 1:
+                    finished = pending.popleft()
+                    _insert_students(finished)
+                    done += len(finished)
+                    if progress:
+                        progress(done, len(candidates))
+
+            while pending:
+                finished = pending.popleft()
+                _insert_students(finished)
+                done += len(finished)
+                if progress:
+                    progress(done, len(candidates))
+
+        # Reload the identification cache with the new faces
+        encoding_cache.invalidate()
+
+    counts = Counter(result['result'] for result in results)
+    logger.info(f"Imported {counts['imported']} students, {counts['error']} failed")
+    return results, counts
+
+def open_photo_archive(file):
+    """
+    Opens an uploaded ZIP of photos without extracting it.
+
+    Raises:
+        ValueError: if the file is not a ZIP archive
+    """
+    try:
+        return zipfile.ZipFile(file)
+    except zipfile.BadZipFile:
+        raise ValueError('Photos must be a ZIP archive')
+
+class StudentImportJobQueue:
+    """
+    Runs imports uploaded through the admin page in the background.
+
+    A large intake takes minutes, far longer than a web worker may hold a
+    request. The upload is saved (roster in a StudentImportJob row, ZIP in
+    ``directory``) and a thread of the receiving process runs
+    ``import_students``, recording its progress on the row, which the
+    import page polls. One import runs at a time per process.
+
+    Students are committed batch by batch, so an import cut short by a
+    restart keeps the students it got to; its job is reported failed once
+    it shows no progress for ``stale_after`` seconds, and uploading the
+    same files again imports the rest (the others fail as existing IDs).
+    """
+
+    def __init__(self, stale_after=600):
+        self.stale_after = stale_after
+        self.app = None
+        self.directory = None
+        self.workers = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def init_app(self, app):
+        """Use ``app`` (for the app context of the worker thread) and its STUDENT_IMPORT_* config"""
+        self.app = app
+        self.directory = os.path.join(app.instance_path, 'imports')
+        self.workers = app.config.get('STUDENT_IMPORT_WORKERS')
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Threads do not survive a fork, so start one in every process
+            self._pid = os.getpid()
+            self._queue = queue.Queue()
+            threading.Thread(target=self._run, name='student-import', daemon=True).start()
+
+    def submit(self, roster_text, photos_file):
+        """
+        Saves an uploaded roster and photo ZIP and queues their import.
+        Commits the session.
+
+        Args:
+            roster_text: Roster CSV text
+            photos_file: Uploaded ZIP (werkzeug FileStorage)
+
+        Returns:
+            Job ID
+
+        Raises:
+            ValueError: if the roster lacks a column or the photos are not a ZIP
+        """
+        parse_roster(roster_text)
+
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.directory, exist_ok=True)
+        archive_path = os.path.join(self.directory, f'{job_id}.zip')
+        photos_file.save(archive_path)
+        try:
+            open_photo_archive(archive_path).close()
+            db.session.add(StudentImportJob(id=job_id, roster=roster_text, archive_path=archive_path,
+                                            status='pending'))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            os.remove(archive_path)
+            raise
+
+        self._ensure_started()
+        self._queue.put(job_id)
+        return job_id
+
+    def get(self, job_id):
+        """The job (failed if it stopped making progress), or None if it does not exist"""
+        job = db.session.get(StudentImportJob, job_id, options=[db.defer(StudentImportJob.roster)])
+        if job is None or job.status in ('done', 'failed'):
+            return job
+
+        last_seen = job.updated_at or job.created_at
+        if last_seen and last_seen < datetime.utcnow() - timedelta(seconds=self.stale_after):
+            logger.warning(f"Student import {job_id} stopped making progress")
+            self._finish(job_id, 'failed', message='The import stopped, probably because the server restarted. '
+                                                   'Upload the files again to import the remaining students.')
+            db.session.refresh(job)
+        return job
+
+    def _update(self, job_id, **values):
+        db.session.execute(
+            db.update(StudentImportJob).where(StudentImportJob.id == job_id)
+            .values(updated_at=datetime.utcnow(), **values)
+        )
+        db.session.commit()
+
+    def _finish(self, job_id, status, **values):
+        archive_path = db.session.query(StudentImportJob.archive_path).filter_by(id=job_id).scalar()
+        self._update(job_id, status=status, roster=None, archive_path=None,
+                     finished_at=datetime.utcnow(), **values)
+        if archive_path and os.path.exists(archive_path):
+            os.remove(archive_path)
+
+    def process(self, job_id):
+        """Runs one job if it is still pending"""
+        claimed = db.session.execute(
+            db.update(StudentImportJob).where(
+                StudentImportJob.id == job_id, StudentImportJob.status == 'pending'
+            ).values(status='running', started_at=datetime.utcnow(), updated_at=datetime.utcnow())
+        ).rowcount == 1
+        db.session.commit()
+        if not claimed:
+            return
+
+        job = db.session.get(StudentImportJob, job_id)
+        try:
+            roster = parse_roster(job.roster)
+            with open_photo_archive(job.archive_path) as archive:
+                results, counts = import_students(
+                    roster, archive, workers=self.workers,
+                    progress=lambda done, total: self._update(job_id, processed=done, total=total)
+                )
+            failures = [result for result in results if result['result'] == 'error']
+            self._finish(job_id, 'done', imported=counts['imported'], failed=counts['error'],
+                         failures=json.dumps(failures))
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error importing students (job {job_id}): {str(e)}")
+            self._finish(job_id, 'failed', message=f'Error importing students: {str(e)}'[:255])
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            with self.app.app_context():
+                try:
+                    self.process(job_id)
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Student import worker error: {str(e)}")
+
+# Shared import queue for this worker process; create_app calls init_app
+student_import_jobs = StudentImportJobQueue()
@@ -0,0 +1,134 @@
+import os
+import logging
+import tempfile
+
+from blob_store import blob_store, is_blob_key
+from image_utils import LazyModule, decode_image
+
+logger = logging.getLogger(__name__)
+
+cv2 = LazyModule('cv2')
+
+# Square thumbnail edge lengths in pixels (128 is the 2x variant of 64)
+THUMBNAIL_SIZES = (64, 128, 256)
+
+# Output formats: file extension, Content-Type and OpenCV encoder parameters
+# (named, so that cv2 is only imported once a thumbnail is made)
+THUMBNAIL_FORMATS = {
+    'webp': ('.webp', 'image/webp', [('IMWRITE_WEBP_QUALITY', 80)]),
+    'jpeg': ('.jpg', 'image/jpeg', [('IMWRITE_JPEG_QUALITY', 85), ('IMWRITE_JPEG_PROGRESSIVE', 1)]),
+}
+
+def make_thumbnail(image_bytes, size, fmt='jpeg'):
+    """
+    Creates a square thumbnail from an encoded image.
+
+    The image is center-cropped to a square (the templates show photos as
+    circles with object-fit: cover) and shrunk with area interpolation.
+
+    Args:
+        image_bytes: Encoded source image
+        size: Edge length in pixels
+        fmt: 'webp' or 'jpeg'
+
+    Returns:
+        Encoded thumbnail bytes, or None if the source cannot be decoded
+    """
+    image = decode_image(image_bytes, grayscale=False)
+    if image is None:
+        return None
+
+    height, width = image.shape[:2]
+    side = min(height, width)
+    top = (height - side) // 2
+    left = (width - side) // 2
+    square = image[top:top + side, left:left + side]
+
+    if side > size:
+        square = cv2.resize(square, (size, size), interpolation=cv2.INTER_AREA)
+
+    extension, _, params = THUMBNAIL_FORMATS[fmt]
+    flags = [value for name, setting in params for value in (getattr(cv2, name), setting)]
+    ok, encoded = cv2.imencode(extension, square, flags)
+    return encoded.tobytes() if ok else None
+
+class ThumbnailCache:
+    """
+    On-disk cache of profile image thumbnails.
+
+    Thumbnails are created lazily on first request from the original in the
+    blob store and written to ``root`` as ``ab/<key>-<size>.<ext>``. Blob
+    keys are content hashes, so a cached thumbnail never goes stale.
+    """
+
+    def __init__(self, root=None, blobs=blob_store):
+        self.root = root
+        self.blobs = blobs
+
+    def _path(self, key, size, fmt):
+        if not is_blob_key(key):
+            raise ValueError(f"Invalid blob key: {key!r}")
+        return os.path.join(self.root, key[:2], f"{key}-{size}{THUMBNAIL_FORMATS[fmt][0]}")
+
+    def get(self, key, size, fmt='jpeg'):
+        """
+        Returns the thumbnail bytes, creating and caching them if needed.
+
+        Returns:
+            Encoded thumbnail, or None if there is no source image for key
+        """
+        if size not in THUMBNAIL_SIZES:
+            raise ValueError(f"Unsupported thumbnail size: {size}")
+
+        path = self._path(key, size, fmt)
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+
+        source = self.blobs.get(key)
+        if source is None:
+            return None
+
+        data = make_thumbnail(source, size, fmt)
+        if data is None:
+            logger.warning(f"Could not create a {size}px thumbnail for image {key}")
+            return None
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        # Write to a temporary file and rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Error caching thumbnail {path}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return data
+
+    def delete(self, key):
+        """Removes every cached thumbnail of an image"""
+        for size in THUMBNAIL_SIZES:
+            for fmt in THUMBNAIL_FORMATS:
+                try:
+                    os.remove(self._path(key, size, fmt))
+                except FileNotFoundError:
+                    pass
+
+    def warm(self, key, formats=('webp', 'jpeg')):
+        """Creates every thumbnail variant for an image ahead of the first request"""
+        try:
+            for size in THUMBNAIL_SIZES:
+                for fmt in formats:
+                    self.get(key, size, fmt)
+        except Exception as e:
+            # Not fatal, the thumbnail route creates them on demand
+            logger.error(f"Error creating thumbnails for image {key}: {str(e)}")
+
+# Shared thumbnail cache; the app sets its root (THUMBNAIL_CACHE_PATH)
+thumbnail_cache = ThumbnailCache()
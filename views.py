@@ -0,0 +1,1128 @@
+import logging
+from datetime import datetime, date
+from flask import Blueprint, Response, current_app, render_template, request, redirect, url_for, session, flash, abort, make_response, stream_with_context
+from functools import wraps  # Add this import for the decorator
+from sqlalchemy import func
+
+from face_utils import encode_face, get_encoder, pack_encoding
+from blob_store import blob_store, guess_mimetype, is_blob_key
+from db_pool import pool_status
+from image_utils import StageTimer, pipeline_stats, read_face_image, read_image_bytes
+from thumbnails import THUMBNAIL_FORMATS, THUMBNAIL_SIZES, thumbnail_cache
+from attendance_bulk import BULK_ACTIONS, apply_marks, expand_class_marks, parse_csv_marks
+from attendance_export import EXPORT_FORMATS, export_filename, iter_export
+from attendance_jobs import attendance_jobs, verify_and_mark
+from attendance_summary import adjust_daily_summary, adjust_enrolment, change_student_class, daily_totals, mark_present
+from encoding_cache import encoding_cache
+from registration_review import pending_duplicates, review_requests
+from student_import import student_import_jobs
+from queries import (attendance_page, class_names, registration_request_counts, registration_request_page,
+                     student_page, student_profiles_query)
+from models import db, Admin, Student, Attendance, AttendanceDailySummary, StudentRegistrationRequest, RequestStatus
+
+logger = logging.getLogger(__name__)
+
+# Every page and API route; create_app (app.py) registers the blueprint
+bp = Blueprint('main', __name__)
+
+# Define admin_required decorator
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not session.get('is_admin'):
+            flash('Please login as admin first!', 'warning')
+            return redirect(url_for('main.admin_login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+# Page sizes for the keyset-paginated listings
+DASHBOARD_PAGE_SIZE = 50
+ATTENDANCE_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 500
+
+def parse_date_arg(name):
+    """
+    Reads an optional YYYY-MM-DD query parameter.
+
+    Returns:
+        date, or None if the parameter is missing or empty
+
+    Raises:
+        ValueError: if the value is not a valid date
+    """
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f"{name} must be a YYYY-MM-DD date")
+
+def page_size_arg(default=50):
+    """The ``limit`` query parameter, clamped to 1..MAX_PAGE_SIZE"""
+    return max(1, min(request.args.get('limit', default, type=int), MAX_PAGE_SIZE))
+
+# Route for home page
+@bp.route('/')
+def index():
+    return render_template('index.html')
+
+# Admin login routes
+@bp.route('/admin/login', methods=['GET', 'POST'])
+def admin_login():
+    if request.method == 'POST':
+        username = request.form.get('username')
+        password = request.form.get('password')
+
+        # For debugging
+        logger.debug(f"Login attempt for admin: {username}")
+
+        admin = Admin.query.filter_by(username=username).first()
+
+        if admin and admin.check_password(password):
+            session['admin_id'] = admin.id
+            session['username'] = admin.username
+            session['is_admin'] = True
+            flash('Login successful!', 'success')
+            return redirect(url_for('main.admin_dashboard'))
+        else:
+            # For debugging admin authentication issues
+            if admin:
+                logger.debug(f"Admin found but password check failed for: {username}")
+            else:
+                logger.debug(f"Admin not found: {username}")
+            flash('Invalid username or password', 'danger')
+
+    return render_template('admin_login.html')
+
+# Student login routes
+@bp.route('/student/login', methods=['GET', 'POST'])
+def student_login():
+    if request.method == 'POST':
+        student_id = request.form.get('student_id')
+        password = request.form.get('password')
+
+        logger.debug(f"Login attempt for student ID: {student_id}")
+        student = Student.query.get(student_id)
+
+        if student and student.check_password(password):
+            logger.debug("Student found and password check successful")
+            session['student_id'] = student.id
+            session['name'] = student.name
+            session['is_admin'] = False
+            flash('Login successful!', 'success')
+            return redirect(url_for('main.student_dashboard'))
+        else:
+            if not student:
+                logger.debug(f"No student found with ID: {student_id}")
+            else:
+                logger.debug("Password check failed")
+            flash('Invalid student ID or password', 'danger')
+            return redirect(url_for('main.student_login'))
+
+    return render_template('student_login.html')
+
+# Admin dashboard route
+@bp.route('/admin/dashboard')
+def admin_dashboard():
+    if not session.get('is_admin'):
+        flash('Please login as admin first!', 'warning')
+        return redirect(url_for('main.admin_login'))
+
+    # Calculate attendance statistics
+    today = date.today()
+    students_present_today = db.session.query(
+        func.coalesce(func.sum(AttendanceDailySummary.present_count), 0)
+    ).filter(AttendanceDailySummary.date == today).scalar()
+
+    total_students = Student.query.count()
+    attendance_percentage = 0
+    if total_students > 0:
+        attendance_percentage = (students_present_today / total_students) * 100
+
+    # Per-date chart from the daily summary (one row per day and class)
+    dates, counts, enrolled_counts = daily_totals()
+
+    # Get pending registration requests count
+    pending_count = StudentRegistrationRequest.query.filter_by(
+        status=RequestStatus.PENDING.value
+    ).count()
+    
+    # Debug the chart data
+    logger.debug(f"Chart dates: {dates}")
+    logger.debug(f"Chart counts: {counts}")
+    logger.debug(f"Pending registration requests: {pending_count}")
+
+    # One page of students with today's status, and the latest attendance
+    try:
+        students, next_students_cursor = student_page(limit=DASHBOARD_PAGE_SIZE,
+                                                      cursor=request.args.get('students_after'),
+                                                      on_date=today)
+    except ValueError:
+        students, next_students_cursor = student_page(limit=DASHBOARD_PAGE_SIZE, on_date=today)
+    recent_attendance, _ = attendance_page(limit=10)
+
+    return render_template('admin_dashboard.html', 
+                          students=students,
+                          next_students_cursor=next_students_cursor,
+                          attendance_records=[record.to_dict() for record in recent_attendance],
+                          dates=dates,
+                          counts=counts,
+                          enrolled_counts=enrolled_counts,
+                          students_present_today=students_present_today,
+                          total_students=total_students,
+                          attendance_percentage=attendance_percentage,
+                          pending_count=pending_count,
+                          date=date)
+
+# Add student route
+@bp.route('/admin/add_student', methods=['GET', 'POST'])
+def add_student_route():
+    if not session.get('is_admin'):
+        flash('Please login as admin first!', 'warning')
+        return redirect(url_for('main.admin_login'))
+
+    if request.method == 'POST':
+        try:
+            name = request.form.get('name')
+            student_id = request.form.get('student_id')
+            password = request.form.get('password')
+            class_name = request.form.get('class_name')
+
+            # Get face image from the form, decoded straight to grayscale
+            timer = StageTimer('add_student')
+            face_image_np, face_image_bytes = read_face_image(timer=timer)
+
+            if not (name and student_id and password and class_name and face_image_bytes is not None):
+                flash('All fields are required', 'danger')
+                return redirect(url_for('main.add_student_route'))
+
+            if face_image_np is None:
+                flash('Invalid image data provided', 'danger')
+                return redirect(url_for('main.add_student_route'))
+
+            # Encode the face
+            face_encoding = encode_face(face_image_np, timer=timer)
+            timer.record()
+
+            if face_encoding is None:
+                flash('No face detected in the image. Please try again.', 'danger')
+                return redirect(url_for('main.add_student_route'))
+
+            # Check if student_id already exists
+            existing_student = Student.query.get(student_id)
+            if existing_student:
+                flash('Student ID already exists', 'danger')
+                return redirect(url_for('main.add_student_route'))
+
+            # Pack the face encoding into the binary storage format
+            face_encoding_blob = pack_encoding(face_encoding)
+
+            # Create a new student record
+            new_student = Student(
+                id=student_id,
+                name=name,
+                class_name=class_name,
+                face_encoding=face_encoding_blob,
+                profile_image_key=blob_store.put(face_image_bytes)  # Save the captured image
+            )
+            new_student.set_password(password)
+
+            # Add to database
+            db.session.add(new_student)
+            db.session.flush()
+            adjust_enrolment(class_name, new_student.created_at, 1)
+            db.session.commit()
+            encoding_cache.put(student_id, face_encoding)
+            thumbnail_cache.warm(new_student.profile_image_key)
+
+            flash(f'Student {name} added successfully!', 'success')
+            return redirect(url_for('main.admin_dashboard'))
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error adding student: {str(e)}")
+            flash(f'Error adding student: {str(e)}', 'danger')
+
+    return render_template('add_student.html')
+
+# Enrol a whole intake from a roster CSV and a ZIP of photos; the import
+# runs in the background and the page follows its progress
+@bp.route('/admin/import_students', methods=['GET', 'POST'])
+@admin_required
+def import_students_route():
+    if request.method == 'GET':
+        return render_template('import_students.html')
+
+    roster_file = request.files.get('roster')
+    photos_file = request.files.get('photos')
+    if not (roster_file and roster_file.filename and photos_file and photos_file.filename):
+        flash('Please upload a roster CSV and a ZIP of photos', 'danger')
+        return redirect(url_for('main.import_students_route'))
+
+    try:
+        job_id = student_import_jobs.submit(roster_file.read().decode('utf-8-sig'), photos_file)
+    except (ValueError, UnicodeDecodeError) as e:
+        flash(f'Invalid import: {str(e)}', 'danger')
+        return redirect(url_for('main.import_students_route'))
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error queueing student import: {str(e)}")
+        flash(f'Error importing students: {str(e)}', 'danger')
+        return redirect(url_for('main.import_students_route'))
+
+    return redirect(url_for('main.import_students_job', job_id=job_id))
+
+# Progress and report of a background import (JSON for the page's polling)
+@bp.route('/admin/import_students/jobs/<job_id>')
+@admin_required
+def import_students_job(job_id):
+    job = student_import_jobs.get(job_id)
+    if job is None:
+        if wants_json():
+            return {'success': False, 'message': 'Job not found'}, 404
+        flash('Import not found', 'danger')
+        return redirect(url_for('main.import_students_route'))
+
+    if wants_json():
+        return {'success': True, 'job': job.to_dict()}
+    return render_template('import_students.html', job=job.to_dict())
+
+# Student dashboard route
+@bp.route('/student/dashboard')
+def student_dashboard():
+    if not session.get('student_id'):
+        flash('Please login first!', 'warning')
+        return redirect(url_for('main.student_login'))
+
+    student_id = session.get('student_id')
+    student = Student.query.get(student_id)
+
+    if not student:
+        flash('Student not found', 'danger')
+        return redirect(url_for('main.student_login'))
+
+    # Get attendance records for this student
+    attendance_records = Attendance.query.filter_by(student_id=student_id).all()
+    attendance_data = [record.to_dict() for record in attendance_records]
+
+    # Import datetime and date to use in the template
+    from datetime import datetime as dt, date
+
+    return render_template('student_dashboard.html', 
+                          student=student.to_dict(), 
+                          attendance=attendance_data,
+                          datetime=dt,
+                          date=date)
+
+# Mark attendance route
+@bp.route('/student/attendance', methods=['GET', 'POST'])
+def attendance():
+    if not session.get('student_id'):
+        flash('Please login first!', 'warning')
+        return redirect(url_for('main.student_login'))
+
+    student_id = session.get('student_id')
+    # The stored encoding comes from the encoding cache, so skip loading the blob here
+    student = Student.query.options(db.defer(Student.face_encoding)).get(student_id)
+
+    if not student:
+        flash('Student not found', 'danger')
+        return redirect(url_for('main.student_login'))
+
+    # Read now: verify_and_mark detaches the student, and to_dict() would
+    # load the deferred encoding
+    student_info = {'id': student.id, 'name': student.name,
+                    'class_name': student.class_name, 'email': student.email}
+
+    if request.method == 'POST':
+        if current_app.config['ATTENDANCE_ASYNC']:
+            return submit_attendance_job(student)
+
+        try:
+            # Get face image from the upload (or base64 form field)
+            timer = StageTimer('attendance')
+            face_image_np, face_image_bytes = read_face_image(timer=timer)
+
+            if face_image_bytes is None:
+                flash('No image provided', 'danger')
+                return redirect(url_for('main.attendance'))
+
+            if face_image_np is None:
+                flash('Invalid image data provided', 'danger')
+                return redirect(url_for('main.attendance'))
+
+            category, message = verify_and_mark(student, face_image_np, timer)
+            flash(message, category)
+            if category == 'danger':
+                return redirect(url_for('main.attendance'))
+            return redirect(url_for('main.student_dashboard'))
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error in attendance marking: {str(e)}")
+            flash('An error occurred. Please try again.', 'danger')
+
+    # For GET request, show the attendance form
+    return render_template('attendance.html', student=student_info,
+                           async_mode=current_app.config['ATTENDANCE_ASYNC'])
+
+def wants_json():
+    """Whether the client asked for JSON (the attendance page's fetch does)"""
+    return request.accept_mimetypes.best == 'application/json'
+
+def submit_attendance_job(student):
+    """Queues the uploaded photo for background verification (ATTENDANCE_ASYNC)"""
+    try:
+        image_bytes = read_image_bytes()
+    except ValueError as e:
+        logger.warning(str(e))
+        image_bytes = b''
+
+    if not image_bytes:
+        message = 'No image provided' if image_bytes is None else 'Invalid image data provided'
+        if wants_json():
+            return {'success': False, 'message': message}, 400
+        flash(message, 'danger')
+        return redirect(url_for('main.attendance'))
+
+    try:
+        job_id = attendance_jobs.submit(student.id, image_bytes)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error queueing attendance job: {str(e)}")
+        if wants_json():
+            return {'success': False, 'message': 'An error occurred. Please try again.'}, 500
+        flash('An error occurred. Please try again.', 'danger')
+        return redirect(url_for('main.attendance'))
+
+    if wants_json():
+        return {
+            'success': True,
+            'job_id': job_id,
+            'status_url': url_for('main.attendance_job_status', job_id=job_id)
+        }, 202
+    flash('Your photo was received and is being checked. Your attendance will appear shortly.', 'info')
+    return redirect(url_for('main.student_dashboard'))
+
+# Result of a queued attendance photo, polled by the attendance page
+@bp.route('/student/attendance/jobs/<job_id>')
+def attendance_job_status(job_id):
+    student_id = session.get('student_id')
+    if not student_id:
+        return {'success': False, 'message': 'Unauthorized'}, 401
+
+    job = attendance_jobs.get(job_id, student_id=student_id)
+    if job is None:
+        return {'success': False, 'message': 'Job not found'}, 404
+
+    response = {'success': True, 'job': job.to_dict()}
+    if job.status in ('done', 'failed'):
+        # Shown on the page the client moves on to
+        flash(job.message, job.category)
+        response['redirect_url'] = url_for('main.student_dashboard' if job.category in ('success', 'info')
+                                           else 'main.attendance')
+    return response
+
+# Kiosk attendance route (1:N identification, no login required)
+@bp.route('/kiosk', methods=['GET', 'POST'])
+def kiosk():
+    if request.method == 'POST':
+        try:
+            timer = StageTimer('kiosk')
+            face_image_np, face_image_bytes = read_face_image(timer=timer)
+
+            if face_image_bytes is None:
+                flash('No image provided', 'danger')
+                return redirect(url_for('main.kiosk'))
+
+            if face_image_np is None:
+                flash('Invalid image data provided', 'danger')
+                return redirect(url_for('main.kiosk'))
+
+            # The kiosk camera is fixed, so search near the last face box first
+            captured_face_encoding, face_box = encode_face(face_image_np, encoder=encoding_cache.encoder,
+                                                           roi_hint=session.get('kiosk_face_box'),
+                                                           return_box=True, timer=timer)
+
+            if captured_face_encoding is None:
+                flash('No face detected in the image. Please try again with a clear face position.', 'danger')
+                return redirect(url_for('main.kiosk'))
+
+            session['kiosk_face_box'] = [int(v) for v in face_box]
+
+            # Search the whole enrolled set for the closest face
+            with timer.stage('identify'):
+                student_id, distance = encoding_cache.identify(captured_face_encoding)
+            timer.record()
+
+            if student_id is None or distance >= get_encoder(encoding_cache.encoder).threshold:
+                logger.warning(f"Kiosk identification failed, best distance: {distance}")
+                flash('Face not recognized. Please try again or contact administrator.', 'danger')
+                return redirect(url_for('main.kiosk'))
+
+            student = Student.query.options(db.defer(Student.face_encoding)).get(student_id)
+            if not student:
+                encoding_cache.remove(student_id)
+                flash('Face not recognized. Please try again or contact administrator.', 'danger')
+                return redirect(url_for('main.kiosk'))
+
+            logger.debug(f"Kiosk identified student {student_id} at distance {distance}")
+
+            today = date.today()
+            inserted = mark_present(student, today)
+            db.session.commit()
+            if inserted:
+                flash(f'Welcome {student.name} ({student.id}), your attendance has been marked!', 'success')
+            else:
+                flash(f'{student.name} ({student.id}), your attendance is already marked for today', 'info')
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error in kiosk attendance: {str(e)}")
+            flash('An error occurred. Please try again.', 'danger')
+
+        return redirect(url_for('main.kiosk'))
+
+    return render_template('kiosk.html')
+
+# Admin manage attendance route
+@bp.route('/admin/manage_attendance', methods=['GET', 'POST'])
+def manage_attendance():
+    if not session.get('is_admin'):
+        flash('Please login as admin first!', 'warning')
+        return redirect(url_for('main.admin_login'))
+
+    if request.method == 'POST':
+        try:
+            action = request.form.get('action')
+            student_id = request.form.get('student_id')
+            attendance_date = request.form.get('date')
+
+            if not (action and student_id and attendance_date):
+                flash('Missing required parameters', 'danger')
+                return redirect(url_for('main.admin_dashboard'))
+
+            # Convert string date to date object
+            try:
+                attendance_date = datetime.strptime(attendance_date, '%Y-%m-%d').date()
+            except ValueError:
+                flash('Invalid date format', 'danger')
+                return redirect(url_for('main.admin_dashboard'))
+
+            # Check if student exists
+            student = Student.query.get(student_id)
+            if not student:
+                flash('Student not found', 'danger')
+                return redirect(url_for('main.admin_dashboard'))
+
+            if action == 'mark_present':
+                if mark_present(student, attendance_date):
+                    db.session.commit()
+                    flash(f'Marked {student.name} present on {attendance_date}', 'success')
+                else:
+                    flash(f'Attendance already marked for {student.name} on {attendance_date}', 'info')
+
+            elif action == 'mark_absent':
+                # Find and delete attendance record
+                existing = Attendance.query.filter_by(
+                    student_id=student_id,
+                    date=attendance_date
+                ).first()
+
+                if existing:
+                    db.session.delete(existing)
+                    if existing.status == 'present':
+                        adjust_daily_summary(student.class_name, attendance_date, -1)
+                    db.session.commit()
+                    flash(f'Marked {student.name} absent on {attendance_date}', 'success')
+                else:
+                    flash(f'No attendance record found for {student.name} on {attendance_date}', 'info')
+
+            return redirect(url_for('main.manage_attendance'))
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error managing attendance: {str(e)}")
+            flash(f'Error: {str(e)}', 'danger')
+            return redirect(url_for('main.admin_dashboard'))
+
+    # For GET request, show students for selection and a page of recent attendance
+    students = db.session.query(Student.id, Student.name).order_by(Student.name, Student.id).all()
+    class_filter = request.args.get('class', '')
+
+    try:
+        attendance_records, next_cursor = attendance_page(
+            limit=ATTENDANCE_PAGE_SIZE,
+            cursor=request.args.get('cursor'),
+            class_name=class_filter,
+            date_from=parse_date_arg('date_from'),
+            date_to=parse_date_arg('date_to')
+        )
+    except ValueError as e:
+        flash(f'Invalid filter: {str(e)}', 'warning')
+        attendance_records, next_cursor = attendance_page(limit=ATTENDANCE_PAGE_SIZE)
+
+    return render_template('manage_attendance.html',
+                          students=students,
+                          attendance_records=[a.to_dict() for a in attendance_records],
+                          next_cursor=next_cursor,
+                          class_list=class_names(),
+                          today=date.today().strftime('%Y-%m-%d'))
+
+# JSON listing APIs, keyset-paginated with the next_cursor of each response
+@bp.route('/admin/api/attendance')
+def attendance_api():
+    if not session.get('is_admin'):
+        return {'success': False, 'message': 'Unauthorized'}, 401
+
+    try:
+        records, next_cursor = attendance_page(
+            limit=page_size_arg(),
+            cursor=request.args.get('cursor'),
+            class_name=request.args.get('class'),
+            date_from=parse_date_arg('date_from'),
+            date_to=parse_date_arg('date_to'),
+            student_id=request.args.get('student_id')
+        )
+    except ValueError as e:
+        return {'success': False, 'message': str(e)}, 400
+
+    return {'success': True, 'records': [record.to_dict() for record in records], 'next_cursor': next_cursor}
+
+def bulk_marks_from_request():
+    """
+    The marks of a bulk attendance request.
+
+    Accepts a CSV (uploaded as ``file`` or sent as a text/csv body) with
+    student_id, date and optional action columns; a JSON ``marks`` list of
+    {student_id, date, action}; or an ``action`` for a whole ``class``
+    (optionally only ``student_ids``) from ``date_from`` (or ``date``) to
+    ``date_to``, as JSON or form fields.
+
+    Raises:
+        ValueError: if the request is malformed
+    """
+    params = request.get_json(silent=True) or request.values
+    action = params.get('action', 'mark_present')
+
+    upload = request.files.get('file')
+    if upload and upload.filename:
+        return parse_csv_marks(upload.read().decode('utf-8-sig'), default_action=action)
+    if request.mimetype == 'text/csv':
+        return parse_csv_marks(request.get_data(as_text=True), default_action=action)
+
+    if 'marks' in params:
+        marks = params['marks']
+        if not isinstance(marks, list) or not all(isinstance(mark, dict) for mark in marks):
+            raise ValueError('marks must be a list of objects')
+        return [dict(mark, action=mark.get('action') or action) for mark in marks]
+
+    date_from = params.get('date_from') or params.get('date')
+    if not date_from or not (params.get('class') or params.get('student_ids')):
+        raise ValueError('Send marks, a CSV file, or a class or student_ids with a date')
+    if action not in BULK_ACTIONS:
+        raise ValueError(f"action must be one of {', '.join(BULK_ACTIONS)}")
+
+    student_ids = params.get('student_ids')
+    if isinstance(student_ids, str):
+        student_ids = [student_id.strip() for student_id in student_ids.split(',') if student_id.strip()]
+    try:
+        date_from = datetime.strptime(date_from, '%Y-%m-%d').date()
+        date_to = datetime.strptime(params['date_to'], '%Y-%m-%d').date() if params.get('date_to') else None
+    except ValueError:
+        raise ValueError('Dates must be YYYY-MM-DD')
+    return expand_class_marks(action, params.get('class'), date_from, date_to, student_ids)
+
+# Many attendance marks in one transaction, e.g. to fix a day after a kiosk outage
+@bp.route('/admin/api/attendance/bulk', methods=['POST'])
+def bulk_attendance_api():
+    if not session.get('is_admin'):
+        return {'success': False, 'message': 'Unauthorized'}, 401
+
+    params = request.get_json(silent=True) or request.values
+    dry_run = str(params.get('dry_run', '')).lower() in ('1', 'true')
+
+    try:
+        results, counts = apply_marks(bulk_marks_from_request())
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        return {'success': False, 'message': str(e)}, 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error applying bulk attendance: {str(e)}")
+        return {'success': False, 'message': f'Error: {str(e)}'}, 500
+
+    return {
+        'success': True,
+        'dry_run': dry_run,
+        'counts': {result: counts.get(result, 0) for result in ('marked', 'removed', 'unchanged', 'error')},
+        'results': results
+    }
+
+# Attendance download, streamed so a year of records never sits in memory
+@bp.route('/admin/export/attendance')
+@admin_required
+def export_attendance():
+    fmt = request.args.get('format', 'csv')
+    class_filter = request.args.get('class') or None
+    try:
+        date_from = parse_date_arg('date_from')
+        date_to = parse_date_arg('date_to')
+        chunks = iter_export(fmt, class_filter, date_from, date_to)
+    except ValueError as e:
+        flash(f'Invalid export: {str(e)}', 'warning')
+        return redirect(url_for('main.manage_attendance'))
+
+    filename = export_filename(fmt, class_filter, date_from, date_to)
+    return Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt][0],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@bp.route('/admin/api/students')
+def students_api():
+    if not session.get('is_admin'):
+        return {'success': False, 'message': 'Unauthorized'}, 401
+
+    try:
+        rows, next_cursor = student_page(
+            limit=page_size_arg(),
+            cursor=request.args.get('cursor'),
+            class_name=request.args.get('class'),
+            search=request.args.get('search'),
+            on_date=parse_date_arg('present_on')
+        )
+    except ValueError as e:
+        return {'success': False, 'message': str(e)}, 400
+
+    return {'success': True, 'students': [row._asdict() for row in rows], 'next_cursor': next_cursor}
+
+# Logout route
+@bp.route('/admin/edit_student/<student_id>', methods=['GET', 'POST'])
+@admin_required
+def edit_student(student_id):
+    student = Student.query.get_or_404(student_id)
+    
+    if request.method == 'POST':
+        old_class_name = student.class_name
+        student.name = request.form['name']
+        student.class_name = request.form['class_name']
+        student.email = request.form['email']
+        change_student_class(student, old_class_name)
+        
+        # Update password if provided
+        if request.form['password'] and request.form['password'].strip():
+            student.set_password(request.form['password'])
+        
+        # Handle profile image update if provided
+        if 'profile_image' in request.files and request.files['profile_image'].filename:
+            file = request.files['profile_image']
+            student.profile_image_key = blob_store.put(file.read())
+            
+        db.session.commit()
+        encoding_cache.remove(student_id)  # Re-read from the database on next use
+        flash('Student updated successfully!', 'success')
+        return redirect(url_for('main.student_profiles'))
+    
+    return render_template('edit_student.html', student=student)
+
+@bp.route('/admin/delete_student/<student_id>', methods=['POST'])
+@admin_required
+def delete_student(student_id):
+    student = Student.query.get_or_404(student_id)
+    
+    # Take the student's attendance out of the daily summary
+    present_dates = db.session.query(Attendance.date).filter(
+        Attendance.student_id == student_id, Attendance.status == 'present'
+    ).all()
+    for attendance_date, in present_dates:
+        adjust_daily_summary(student.class_name, attendance_date, -1)
+    adjust_enrolment(student.class_name, student.created_at, -1)
+    
+    # Delete related attendance records first
+    Attendance.query.filter_by(student_id=student_id).delete()
+    
+    # Delete the student
+    db.session.delete(student)
+    db.session.commit()
+    encoding_cache.remove(student_id)
+    
+    flash('Student deleted successfully!', 'success')
+    return redirect(url_for('main.student_profiles'))
+
+# Student Registration Route
+@bp.route('/student/register', methods=['GET', 'POST'])
+def student_register():
+    if request.method == 'POST':
+        try:
+            # Get form data
+            student_id = request.form.get('student_id')
+            name = request.form.get('name')
+            password = request.form.get('password')
+            confirm_password = request.form.get('confirm_password')
+            class_name = request.form.get('class_name')
+            email = request.form.get('email')
+            agree_terms = request.form.get('agree_terms')
+            
+            # Validate required fields
+            if not (student_id and name and password and confirm_password and class_name and agree_terms):
+                flash('Please fill all required fields', 'danger')
+                return render_template('student_register.html')
+            
+            # Check if passwords match
+            if password != confirm_password:
+                flash('Passwords do not match', 'danger')
+                return render_template('student_register.html')
+                
+            # Check if student ID already exists in students table
+            existing_student = Student.query.get(student_id)
+            if existing_student:
+                flash('A student with this ID already exists', 'danger')
+                return render_template('student_register.html')
+                
+            # Check if there's already a pending request with this ID
+            existing_request = StudentRegistrationRequest.query.filter_by(
+                student_id=student_id
+            ).first()
+            
+            if existing_request:
+                if existing_request.status == RequestStatus.PENDING.value:
+                    flash('A registration request with this ID is already pending approval', 'warning')
+                elif existing_request.status == RequestStatus.REJECTED.value:
+                    flash('Your previous registration request was rejected. Please contact an administrator.', 'warning')
+                else:
+                    flash('You are already registered. Please login.', 'info')
+                return render_template('student_register.html')
+            
+            # Process face image captured from webcam
+            profile_image_key = None
+            face_encoding_blob = None
+            timer = StageTimer('student_register')
+            image_np, face_image_bytes = read_face_image(timer=timer)
+            
+            if face_image_bytes is not None:
+                try:
+                    if image_np is None:
+                        raise ValueError('Captured image could not be decoded')
+                    
+                    # Encode the face
+                    face_encoding = encode_face(image_np, timer=timer)
+                    timer.record()
+                    
+                    if face_encoding is None:
+                        flash('No face detected in the captured image. Please try again with a clearer face position.', 'danger')
+                        return render_template('student_register.html')
+                    
+                    # Pack face encoding into the binary storage format
+                    face_encoding_blob = pack_encoding(face_encoding)
+                    
+                    # Store the captured image for the profile
+                    profile_image_key = blob_store.put(face_image_bytes)
+                except Exception as e:
+                    logger.error(f"Error processing captured face image: {str(e)}")
+                    flash('Error processing the captured image. Please try again.', 'danger')
+                    return render_template('student_register.html')
+            else:
+                # No face image provided
+                flash('Please capture your face using the camera before registering.', 'danger')
+                return render_template('student_register.html')
+            
+            # Create the registration request
+            new_request = StudentRegistrationRequest(
+                student_id=student_id,
+                name=name,
+                class_name=class_name,
+                email=email,
+                profile_image_key=profile_image_key,
+                face_encoding=face_encoding_blob,
+                status=RequestStatus.PENDING.value
+            )
+            new_request.set_password(password)
+            
+            # Save to database
+            db.session.add(new_request)
+            db.session.commit()
+            
+            flash('Your registration request has been submitted. An administrator will review it shortly.', 'success')
+            return redirect(url_for('main.student_login'))
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error in student registration: {str(e)}")
+            flash(f'Error in registration: {str(e)}', 'danger')
+    
+    return render_template('student_register.html')
+
+# Admin Manage Registration Requests Route
+REQUESTS_PAGE_SIZE = 50
+
+@bp.route('/admin/manage_requests')
+def manage_requests():
+    if not session.get('is_admin'):
+        flash('Please login as admin first!', 'warning')
+        return redirect(url_for('main.admin_login'))
+
+    # One keyset-paginated page per status tab, without the encodings
+    pages = {}
+    for status in RequestStatus:
+        cursor_arg = f'{status.value}_cursor'
+        try:
+            pages[status.value] = registration_request_page(status.value, limit=REQUESTS_PAGE_SIZE,
+                                                            cursor=request.args.get(cursor_arg))
+        except ValueError as e:
+            flash(f'Invalid page: {str(e)}', 'warning')
+            pages[status.value] = registration_request_page(status.value, limit=REQUESTS_PAGE_SIZE)
+
+    pending_requests = pages[RequestStatus.PENDING.value][0]
+    counts = registration_request_counts()
+
+    return render_template('manage_requests.html',
+                          pending_requests=pending_requests,
+                          approved_requests=pages[RequestStatus.APPROVED.value][0],
+                          rejected_requests=pages[RequestStatus.REJECTED.value][0],
+                          next_cursors={status: page[1] for status, page in pages.items()},
+                          duplicates=pending_duplicates([r.id for r in pending_requests]),
+                          active_tab=request.args.get('tab', RequestStatus.PENDING.value),
+                          pending_count=counts[RequestStatus.PENDING.value],
+                          approved_count=counts[RequestStatus.APPROVED.value],
+                          rejected_count=counts[RequestStatus.REJECTED.value])
+
+@bp.route('/admin/api/registration_requests')
+def registration_requests_api():
+    if not session.get('is_admin'):
+        return {'success': False, 'message': 'Unauthorized'}, 401
+
+    status = request.args.get('status', RequestStatus.PENDING.value)
+    if status not in {s.value for s in RequestStatus}:
+        return {'success': False, 'message': 'Unknown status'}, 400
+    try:
+        requests, next_cursor = registration_request_page(status, limit=page_size_arg(REQUESTS_PAGE_SIZE),
+                                                          cursor=request.args.get('cursor'))
+    except ValueError as e:
+        return {'success': False, 'message': str(e)}, 400
+
+    duplicates = pending_duplicates([r.id for r in requests]) if status == RequestStatus.PENDING.value else {}
+    records = []
+    for reg_request in requests:
+        # Not to_dict(), which would load each face encoding
+        record = {
+            'id': reg_request.id,
+            'student_id': reg_request.student_id,
+            'name': reg_request.name,
+            'class_name': reg_request.class_name,
+            'email': reg_request.email,
+            'profile_image_key': reg_request.profile_image_key,
+            'status': reg_request.status,
+            'admin_notes': reg_request.admin_notes,
+            'created_at': reg_request.created_at.isoformat() if reg_request.created_at else None,
+            'updated_at': reg_request.updated_at.isoformat() if reg_request.updated_at else None
+        }
+        if reg_request.id in duplicates:
+            record['duplicate_of'], record['distance'] = duplicates[reg_request.id]
+        records.append(record)
+    return {'success': True, 'requests': records, 'next_cursor': next_cursor}
+
+def review_requests_response(action):
+    """
+    Approves or rejects the ``request_id`` or ``request_ids`` of a JSON
+    request in one transaction; ``skip_duplicates`` leaves pending the
+    requests whose face matches an enrolled student.
+    """
+    data = request.get_json(silent=True) or {}
+    request_ids = data.get('request_ids')
+    if request_ids is None:
+        request_ids = [data['request_id']] if data.get('request_id') else []
+    if not isinstance(request_ids, list) or not request_ids:
+        return {'success': False, 'message': 'Missing request ID'}, 400
+
+    try:
+        results, counts = review_requests(request_ids, action, data.get('admin_notes', ''),
+                                          skip_duplicates=bool(data.get('skip_duplicates')))
+    except ValueError as e:
+        return {'success': False, 'message': str(e)}, 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error reviewing requests ({action}): {str(e)}")
+        return {'success': False, 'message': f'Error: {str(e)}'}, 500
+
+    # A single request keeps the original one-request responses
+    if 'request_ids' not in data and results[0]['result'] == 'error':
+        code = 404 if results[0]['message'] == 'Request not found' else 400
+        return {'success': False, 'message': results[0]['message']}, code
+
+    done = counts['approved'] + counts['rejected']
+    message = (f"Request {action}d successfully" if 'request_ids' not in data
+               else f"{done} requests {action}d, {counts['skipped']} skipped, {counts['error']} failed")
+    return {
+        'success': True,
+        'message': message,
+        'counts': {result: counts.get(result, 0) for result in ('approved', 'rejected', 'skipped', 'error')},
+        'results': results
+    }
+
+# Admin Approve/Reject Registration Routes
+@bp.route('/admin/manage_requests/approve', methods=['POST'])
+def approve_request():
+    if not session.get('is_admin'):
+        return {'success': False, 'message': 'Unauthorized'}, 401
+    return review_requests_response('approve')
+
+@bp.route('/admin/manage_requests/reject', methods=['POST'])
+def reject_request():
+    if not session.get('is_admin'):
+        return {'success': False, 'message': 'Unauthorized'}, 401
+    return review_requests_response('reject')
+
+def check_profile_image_access(key):
+    """Aborts unless the current user may see the profile image ``key``"""
+    if not is_blob_key(key):
+        abort(404)
+
+    # Admins see every photo, students only their own
+    if not session.get('is_admin'):
+        student_id = session.get('student_id')
+        if not student_id:
+            abort(403)
+        own_key = db.session.query(Student.profile_image_key).filter(Student.id == student_id).scalar()
+        if own_key != key:
+            abort(403)
+
+def immutable_response(etag, load):
+    """
+    Response for content that never changes for a given ETag.
+
+    Args:
+        etag: Strong ETag identifying the content
+        load: Callable returning (data, mimetype), or None if not found
+
+    Returns:
+        304 if the client already holds ``etag``, otherwise the content,
+        cacheable by the browser for a year
+    """
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        loaded = load()
+        if loaded is None:
+            abort(404)
+        data, mimetype = loaded
+        response = make_response(data)
+        response.mimetype = mimetype
+
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
+
+# Profile images, served from the blob store by content hash
+@bp.route('/media/profile/<key>')
+def profile_image(key):
+    check_profile_image_access(key)
+
+    def load():
+        data = blob_store.get(key)
+        return (data, guess_mimetype(data)) if data is not None else None
+
+    # The key is the content hash, so a client holding it already has the bytes
+    return immutable_response(key, load)
+
+# Square profile image thumbnails, WebP for browsers that accept it
+@bp.route('/media/profile/<key>/<int:size>')
+def profile_thumbnail(key, size):
+    check_profile_image_access(key)
+    if size not in THUMBNAIL_SIZES:
+        abort(404)
+
+    fmt = 'webp' if 'image/webp' in request.accept_mimetypes.values() else 'jpeg'
+
+    def load():
+        data = thumbnail_cache.get(key, size, fmt)
+        return (data, THUMBNAIL_FORMATS[fmt][1]) if data is not None else None
+
+    response = immutable_response(f"{key}-{size}-{fmt}", load)
+    response.vary.add('Accept')
+    return response
+
+@bp.route('/admin/metrics/encoding_cache')
+@admin_required
+def encoding_cache_metrics():
+    return encoding_cache.stats()
+
+@bp.route('/admin/metrics/face_ingest')
+@admin_required
+def face_ingest_metrics():
+    return pipeline_stats.stats()
+
+@bp.route('/admin/metrics/attendance_jobs')
+@admin_required
+def attendance_job_metrics():
+    return attendance_jobs.stats()
+
+@bp.route('/admin/metrics/db_pool')
+@admin_required
+def db_pool_metrics():
+    return pool_status(db.engine)
+
+@bp.route('/logout')
+def logout():
+    session.clear()
+    flash('You have been logged out', 'info')
+    return redirect(url_for('main.index'))
+
+@bp.route('/admin/student_profiles')
+@admin_required
+def student_profiles():
+    # Get search, filter, sort and page parameters
+    search = request.args.get('search', '')
+    class_filter = request.args.get('class', '')
+    sort_by = request.args.get('sort', 'name')
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 30, type=int)
+
+    # One grouped query for the page of students with their attendance stats
+    pagination = student_profiles_query(search, class_filter, sort_by).paginate(
+        page=page, per_page=per_page, max_per_page=100, error_out=False
+    )
+
+    students = []
+    for student, attendance_percentage, latest_date in pagination.items:
+        student.attendance_percentage = float(attendance_percentage or 0)
+        student.latest_attendance_date = latest_date
+        students.append(student)
+
+    # Get list of unique class names for the filter dropdown
+    class_list = class_names()
+
+    return render_template('student_profiles.html', 
+                          students=students, 
+                          pagination=pagination,
+                          class_list=class_list,
+                          request=request)
+
+@bp.route('/admin/student_profile/<student_id>')
+@admin_required
+def student_profile_detail(student_id):
+    student = Student.query.get_or_404(student_id)
+    
+    # Get attendance records for this student
+    attendance_records = Attendance.query.filter_by(student_id=student_id).order_by(Attendance.date.desc()).all()
+    
+    # Calculate attendance statistics
+    total_days = len(attendance_records)
+    if total_days > 0:
+        attendance_percentage = (total_days / total_days) * 100
+    else:
+        attendance_percentage = 0
+    
+    # Get dates for attendance chart
+    dates = [record.date.strftime('%Y-%m-%d') for record in attendance_records]
+    
+    return render_template('student_profile_detail.html',
+                          student=student,
+                          attendance_records=attendance_records,
+                          attendance_percentage=attendance_percentage,
+                          dates=dates)
\ No newline at end of file